@@ -0,0 +1,178 @@
+"""
+Benchmarks for the job offer system
+"""
+import argparse
+import json
+import platform
+import random
+import time
+import tracemalloc
+import types
+
+import main as job_offer
+import workload
+from main import Job, User, JobColumns, TimeCondition, np
+
+SIZES = (10_000, 100_000, 1_000_000)
+MEMORY_COUNT = 100_000
+SKILLS = [f"skill{i}" for i in range(50)]
+TIME_CONDITIONS = [condition.value for condition in TimeCondition]
+
+def random_job(rng, cls=Job):
+    """Create a random valid job."""
+    min_age = rng.randint(18, 60)
+    job = cls("job", min_age, rng.randint(min_age, 70),
+              rng.choice(TIME_CONDITIONS), rng.randint(0, 100) * 1000)
+    job.validate()
+    for skill in rng.sample(SKILLS, rng.randint(0, 5)):
+        job.add_skill(skill)
+    return job
+
+def random_user(rng, cls=User):
+    """Create a random valid user."""
+    user = cls("user", rng.randint(18, 70),
+                rng.choice(TIME_CONDITIONS), rng.randint(0, 100) * 1000)
+    user.validate()
+    for skill in rng.sample(SKILLS, rng.randint(0, 8)):
+        user.add_skill(skill)
+    return user
+
+def bench_scoring(size, rng):
+    """Compare per-pair and vectorized scoring for one job table size."""
+    jobs = {}
+    for _ in range(size):
+        job = random_job(rng)
+        jobs[job.id] = job
+    user = random_user(rng)
+    columns = JobColumns.from_jobs(jobs)
+
+    start = time.perf_counter()
+    expected = [user.score_system(user, job) for job in jobs.values()]
+    per_pair = time.perf_counter() - start
+
+    start = time.perf_counter()
+    scores = columns.scores(user)
+    vectorized = time.perf_counter() - start
+
+    if scores.tolist() != expected:
+        raise AssertionError(f"vectorized scores differ at {size} jobs")
+    print(f"{size:>9} jobs: per-pair {per_pair:8.3f}s, "
+          f"vectorized {vectorized:8.4f}s, "
+          f"speedup {per_pair / max(vectorized, 1e-9):7.1f}x")
+
+def dict_backed(cls):
+    """Copy a record class without __slots__ and with an eager skill_views."""
+    namespace = {key: value for key, value in vars(cls).items()
+                 if key != '__slots__'
+                 and not isinstance(value, types.MemberDescriptorType)}
+
+    def __init__(self, *args):
+        cls.__init__(self, *args)
+        self.skill_views = {}
+
+    namespace['__init__'] = __init__
+    return type(f"Dict{cls.__name__}", cls.__bases__, namespace)
+
+def bench_memory(count, rng):
+    """Report the traced bytes per user and per job, table slot included.
+
+    The dict rows use __dict__-backed copies of User and Job, laid out
+    like the records before __slots__, as a reference for the slotted rows.
+    """
+    rows = (("user", User, random_user), ("job", Job, random_job))
+    for layout in ("dict", "slots"):
+        for label, cls, factory in rows:
+            if layout == "dict":
+                cls = dict_backed(cls)
+            table = {}
+            tracemalloc.start()
+            before = tracemalloc.get_traced_memory()[0]
+            for _ in range(count):
+                record = factory(rng, cls)
+                table[record.id] = record
+            used = tracemalloc.get_traced_memory()[0] - before
+            tracemalloc.stop()
+            print(f"{layout:>5} {label:>4}: {used / count:8.1f} bytes "
+                  f"per {label} ({count} records)")
+
+def bench_workload(params):
+    """Run a generated workload in this process and return its results."""
+    lines = list(workload.generate(**params))
+    stats = job_offer.CommandStats()
+    start = time.perf_counter()
+    job_offer.process(iter(lines), lambda text: None, stats=stats)
+    elapsed = time.perf_counter() - start
+    commands = len(lines) - 3
+    return {
+        'params': params,
+        'python': platform.python_version(),
+        'numpy': np is not None,
+        'commands': commands,
+        'seconds': elapsed,
+        'commands_per_second': commands / elapsed,
+        'latency': stats.summary()['commands'],
+    }
+
+def print_results(results):
+    """Print workload results as a table."""
+    print(f"{results['commands']} commands in {results['seconds']:.3f}s: "
+          f"{results['commands_per_second']:.0f} commands/s")
+    print(f"{'command':<18}{'count':>10}{'p50 ms':>12}{'p99 ms':>12}{'max ms':>12}")
+    for command, entry in results['latency'].items():
+        print(f"{command:<18}{entry['count']:>10}{entry['p50'] * 1e3:>12.3f}"
+              f"{entry['p99'] * 1e3:>12.3f}{entry['max'] * 1e3:>12.3f}")
+
+def compare(old, new):
+    """Print how a second result file differs from a first one."""
+    if old['params'] != new['params']:
+        print("warning: the runs used different workload parameters")
+    print(f"commands/s: {old['commands_per_second']:.0f} -> "
+          f"{new['commands_per_second']:.0f} "
+          f"({new['commands_per_second'] / old['commands_per_second']:.2f}x)")
+    print(f"{'command':<18}{'old p50 ms':>12}{'new p50 ms':>12}{'old p99 ms':>12}{'new p99 ms':>12}")
+    for command in sorted(set(old['latency']) | set(new['latency'])):
+        before = old['latency'].get(command, {'p50': 0, 'p99': 0})
+        after = new['latency'].get(command, {'p50': 0, 'p99': 0})
+        print(f"{command:<18}{before['p50'] * 1e3:>12.3f}{after['p50'] * 1e3:>12.3f}"
+              f"{before['p99'] * 1e3:>12.3f}{after['p99'] * 1e3:>12.3f}")
+
+def main():
+    """Run the benchmark named on the command line."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    modes = parser.add_subparsers(dest='mode', required=True)
+    scoring = modes.add_parser('scoring', help='per-pair vs vectorized scoring')
+    scoring.add_argument('sizes', type=int, nargs='*', default=SIZES)
+    memory = modes.add_parser('memory', help='bytes per user and per job')
+    memory.add_argument('count', type=int, nargs='?', default=MEMORY_COUNT)
+    run = modes.add_parser('workload', help='run a generated workload')
+    workload.add_arguments(run)
+    run.add_argument('--output', metavar='FILE', help='save the results as JSON')
+    diff = modes.add_parser('compare', help='compare two saved workload results')
+    diff.add_argument('old')
+    diff.add_argument('new')
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    if args.mode == 'memory':
+        bench_memory(args.count, rng)
+    elif args.mode == 'scoring':
+        if np is None:
+            print("numpy is required for the columnar scorer")
+            return
+        for size in args.sizes:
+            bench_scoring(size, rng)
+    elif args.mode == 'workload':
+        results = bench_workload(workload.workload_params(args))
+        print_results(results)
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                json.dump(results, f, indent=2)
+    else:
+        with open(args.old, encoding='utf-8') as f:
+            old = json.load(f)
+        with open(args.new, encoding='utf-8') as f:
+            new = json.load(f)
+        compare(old, new)
+
+if __name__ == "__main__":
+    main()
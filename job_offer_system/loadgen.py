@@ -0,0 +1,106 @@
+"""
+Load generator for the job offer server
+
+Opens concurrent connections to server.py, sends a seeded mix of commands
+with one request in flight per connection, and reports the throughput and
+the latency percentiles.
+"""
+import argparse
+import asyncio
+import random
+import time
+
+TIME_CONDITIONS = ('FULLTIME', 'PARTTIME', 'PROJECT')
+MIX = (('GET-JOBLIST', 30), ('VIEW', 30), ('JOB-STATUS', 10), ('USER-STATUS', 10),
+       ('GET-USERLIST', 5), ('ADD-JOB', 5), ('ADD-USER', 5),
+       ('ADD-JOB-SKILL', 3), ('ADD-USER-SKILL', 2))
+
+def random_command(rng, skills, size):
+    """Return a random command line against ids up to size."""
+    size = max(size, 1)
+    command = rng.choices([c for c, _ in MIX], weights=[w for _, w in MIX])[0]
+    if command == 'ADD-JOB':
+        min_age = rng.randint(18, 50)
+        return (f"ADD-JOB job {min_age} {rng.randint(min_age, 65)} "
+                f"{rng.choice(TIME_CONDITIONS)} {rng.randint(1, 50) * 1000}")
+    if command == 'ADD-USER':
+        return (f"ADD-USER user {rng.randint(18, 65)} "
+                f"{rng.choice(TIME_CONDITIONS)} {rng.randint(1, 50) * 1000}")
+    if command in ('ADD-JOB-SKILL', 'ADD-USER-SKILL'):
+        return f"{command} {rng.randint(1, size)} {rng.choice(skills)}"
+    if command == 'VIEW':
+        return f"VIEW {rng.randint(1, size)} {rng.randint(1, size)}"
+    return f"{command} {rng.randint(1, size)}"
+
+async def open_connection(args):
+    """Connect to the server over TCP or a Unix socket."""
+    if args.unix:
+        return await asyncio.open_unix_connection(args.unix)
+    host, _, port = args.tcp.rpartition(':')
+    return await asyncio.open_connection(host or 'localhost', int(port))
+
+async def run_client(args, seed, latencies):
+    """Send the requests of one connection, recording their latencies."""
+    rng = random.Random(seed)
+    reader, writer = await open_connection(args)
+    for _ in range(args.requests):
+        line = random_command(rng, args.skills, args.size)
+        started = time.perf_counter()
+        writer.write(line.encode() + b'\n')
+        await writer.drain()
+        await reader.readline()
+        latencies.append(time.perf_counter() - started)
+    writer.close()
+    await writer.wait_closed()
+
+async def seed_state(args):
+    """Create the users and jobs the random commands refer to."""
+    rng = random.Random(args.seed)
+    reader, writer = await open_connection(args)
+    for command in ('ADD-JOB', 'ADD-USER'):
+        for _ in range(args.size):
+            line = random_command(rng, args.skills, args.size)
+            while not line.startswith(command + ' '):
+                line = random_command(rng, args.skills, args.size)
+            writer.write(line.encode() + b'\n')
+            await writer.drain()
+            await reader.readline()
+    writer.close()
+    await writer.wait_closed()
+
+def percentile(ordered, fraction):
+    """Return a percentile of sorted values."""
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+async def run(args):
+    """Run the load and print the report."""
+    if args.size:
+        await seed_state(args)
+    latencies = []
+    started = time.perf_counter()
+    await asyncio.gather(*(run_client(args, args.seed + i + 1, latencies)
+                           for i in range(args.connections)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    print(f"{len(latencies)} requests over {args.connections} connections "
+          f"in {elapsed:.3f}s: {len(latencies) / elapsed:.0f} req/s")
+    print(f"latency ms: p50 {percentile(latencies, 0.50) * 1e3:.3f}, "
+          f"p99 {percentile(latencies, 0.99) * 1e3:.3f}, "
+          f"p99.9 {percentile(latencies, 0.999) * 1e3:.3f}, "
+          f"max {latencies[-1] * 1e3:.3f}")
+
+def main():
+    """Parse the command line and run the load."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--tcp', default='localhost:8765', metavar='[HOST]:PORT')
+    parser.add_argument('--unix', metavar='PATH', help='connect to a Unix socket instead')
+    parser.add_argument('--connections', type=int, default=32)
+    parser.add_argument('--requests', type=int, default=1000, help='requests per connection')
+    parser.add_argument('--size', type=int, default=1000,
+                        help='jobs and users to create before the run')
+    parser.add_argument('--skills', nargs='*', default=['python', 'sql', 'go', 'rust'])
+    parser.add_argument('--seed', type=int, default=0)
+    asyncio.run(run(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,48 @@
 """
 Job Offer System
 """
+import argparse
+import cProfile
+import heapq
+import io
+import json
+import multiprocessing
+import os
+import pickle
+import pstats
+import struct
+import sys
+import threading
+import time
+from bisect import insort
 from enum import Enum
 from math import floor
 
+try:
+    import numpy as np
+except ImportError:  # the columnar scorer is optional
+    np = None
+
+JOBLIST_SIZE = 5
+CHUNK_SIZE = 1 << 20
+FLUSH_EVERY = 4096
+SHARD_SIZE = 1024
+SNAPSHOT_EVERY = 100_000
+STATS_ENV = 'JOB_OFFER_STATS'
+STATS_FILE_ENV = 'JOB_OFFER_STATS_FILE'
+STATS_OFF = frozenset(('', '0', 'false', 'no', 'off'))
+STATS_ON = frozenset(('1', 'true', 'yes', 'on', '-'))
+JOURNALED = frozenset(("ADD-JOB", "ADD-USER", "ADD-JOB-SKILL", "ADD-USER-SKILL", "VIEW"))
+
+skill_bits = {}
+
+def skill_bit(skill):
+    """Return the bit of a skill, interning it on first use."""
+    bit = skill_bits.get(skill)
+    if bit is None:
+        bit = skill_bits[skill] = 1 << len(skill_bits)
+    return bit
+
 class JobAndUserError(Exception):
     """Base class for exceptions in this module."""
 
@@ -45,12 +84,16 @@ class TimeCondition(Enum):
 
 class Job:
     """Job Class"""
+    __slots__ = ('id', '_skills', '_skill_mask', '_name', '__temp_age',
+                 '_min_age', '_max_age', '_time_condition', '_salary',
+                 'views', 'skill_views')
     _id_counter = 1
     jobs = []
 
     def __init__(self, name, min_age, max_age, time_condition, salary) -> None:
         self.id = None
         self._skills = []
+        self._skill_mask = 0
         self._name = self.name = name
         self.__temp_age = int(max_age)
         self._min_age = self.min_age = min_age
@@ -58,7 +101,7 @@ class Job:
         self._time_condition = self.time_condition = time_condition
         self._salary = self.salary = salary
         self.views = 0
-        self.skill_views = {}
+        self.skill_views = None  # created on the first view
 
     def __str__(self) -> str:
         return (
@@ -86,11 +129,22 @@ class Job:
         """Increment view count for the job and associated skill."""
         self.views += 1
         # print(self.name,self.views)
+        if self.skill_views is None:
+            self.skill_views = {}
         if skill in self.skill_views:
             self.skill_views[skill] += 1
         else:
             self.skill_views[skill] = 1
 
+    def has_skill(self, skill):
+        """Check whether the skill is already recorded."""
+        return bool(self._skill_mask & skill_bits.get(skill, 0))
+
+    def add_skill(self, skill):
+        """Record a skill, keeping insertion order for the status output."""
+        self._skills.append(skill)
+        self._skill_mask |= skill_bit(skill)
+
     # Properties
 
     @property
@@ -128,7 +182,8 @@ class Job:
     @skills.setter
     def skills(self, *skills):
         """Set skills property."""
-        self._skills.extend(skills)
+        for skill in skills:
+            self.add_skill(skill)
 
     @name.setter
     def name(self, name):
@@ -200,18 +255,21 @@ class Job:
 
 class User:
     """User Class"""
+    __slots__ = ('id', '_skills', '_skill_mask', '_name', '_age',
+                 '_time_condition', '_salary', 'total_views', 'skill_views')
     _id_counter = 1
     users = []
 
     def __init__(self, name, age, time_condition, salary) -> None:
         self.id = None
         self._skills = []
+        self._skill_mask = 0
         self._name = self.name = name
         self._age = self.age = age
         self._time_condition = self.time_condition = time_condition
         self._salary = self.salary = salary
         self.total_views = 0
-        self.skill_views = {}
+        self.skill_views = None  # created on the first view
 
     def __str__(self) -> str:
         return (
@@ -237,28 +295,28 @@ class User:
     def view_job(self, job_id, joblist):
         """User views a job, incrementing its view count even if the user has no skills."""
         if job_id not in joblist:
-            print("invalid index")
-            return
+            return "invalid index"
 
         job = joblist[job_id]
+        if self.skill_views is None:
+            self.skill_views = {}
 
-        skill_viewed = False
-        for skill in self._skills:
-            if skill in job._skills:
-                job.increment_view(skill)
-                skill_viewed = True
-                if skill in self.skill_views:
-                    self.skill_views[skill] += 1
-                else:
-                    self.skill_views[skill] = 1
-
-        if not skill_viewed:
+        common = self._skill_mask & job._skill_mask
+        if common:
+            for skill in self._skills:
+                if common & skill_bits[skill]:
+                    job.increment_view(skill)
+                    if skill in self.skill_views:
+                        self.skill_views[skill] += 1
+                    else:
+                        self.skill_views[skill] = 1
+        else:
             job.increment_view(None)
             for skill in self._skills:
                 if skill not in self.skill_views:
                     self.skill_views[skill] = 0
 
-        print("tracked")
+        return "tracked"
 
     def score_system(self, user, job):
         """The score system to determine the score of a user based on his attributes"""
@@ -278,15 +336,10 @@ class User:
                 agescore = max_age - user_age
             return agescore
         def skill_score():
-            user_skill = user.skills
-            job_skill = job.skills
-            skillscore = 0
-            for skill in job_skill:
-                if skill in user_skill:
-                    skillscore += 3
-                else:
-                    skillscore -= 1
-            return skillscore
+            # +3 for every job skill the user has, -1 for every other one
+            job_mask = job._skill_mask
+            common = (user._skill_mask & job_mask).bit_count()
+            return 4 * common - job_mask.bit_count()
         def time_score():
             user_time = user.time_condition
             job_time = job.time_condition
@@ -327,6 +380,15 @@ class User:
         score += job.id
         return score
 
+    def has_skill(self, skill):
+        """Check whether the skill is already recorded."""
+        return bool(self._skill_mask & skill_bits.get(skill, 0))
+
+    def add_skill(self, skill):
+        """Record a skill, keeping insertion order for the status output."""
+        self._skills.append(skill)
+        self._skill_mask |= skill_bit(skill)
+
     # Properties
 
     @property
@@ -359,7 +421,8 @@ class User:
     @skills.setter
     def skills(self, *skills):
         """Set skills property."""
-        self._skills.extend(skills)
+        for skill in skills:
+            self.add_skill(skill)
 
     @name.setter
     def name(self, name):
@@ -420,14 +483,13 @@ class User:
         return True
 
 def job_status(job_id, jobs):
-    """Display the status of a job."""
+    """Return the status line of a job."""
     if job_id not in jobs:
-        print("invalid index")
-        return
+        return "invalid index"
 
     job = jobs[job_id]
     total_views = job.views
-    skill_views = job.skill_views
+    skill_views = job.skill_views or {}
 
     all_skills = job._skills
     skill_views_output = []
@@ -439,19 +501,17 @@ def job_status(job_id, jobs):
     skills_output = ", ".join(skill_views_output)
 
     if all_skills:
-        print(f"{job.name}-{total_views}-({skills_output})")
-    else:
-        print(f"{job.name}-{total_views}-")
+        return f"{job.name}-{total_views}-({skills_output})"
+    return f"{job.name}-{total_views}-"
 
 def user_status(user_id, users):
-    """Display the status of a user."""
+    """Return the status line of a user."""
     if user_id not in users:
-        print("invalid index")
-        return
+        return "invalid index"
 
     user = users[user_id]
     total_views = user.total_views
-    skill_views = user.skill_views
+    skill_views = user.skill_views or {}
 
     all_skills = user._skills
     skill_views_output = []
@@ -463,9 +523,322 @@ def user_status(user_id, users):
     skills_output = ", ".join(skill_views_output)
 
     if all_skills:
-        print(f"{user.name}-({skills_output})")
+        return f"{user.name}-({skills_output})"
+    return f"{user.name}-"
+
+def top_jobs(user, jobs, k=JOBLIST_SIZE):
+    """Return the k best (job, score) pairs for a user, best first.
+
+    Scores are streamed into a bounded heap instead of sorting every job;
+    ties keep the job table order, exactly like a stable reverse sort.
+    """
+    scored = ((job, user.score_system(user, job)) for job in jobs.values())
+    return heapq.nlargest(k, scored, key=lambda x: x[1])
+
+class JobColumns:
+    """Columnar copy of the job table for scoring every job in one pass.
+
+    Ages, salaries and time conditions live in NumPy arrays indexed by row,
+    and job skills are kept as a sparse incidence matrix: one array of job
+    rows per skill. Scores are identical to User.score_system.
+    """
+    TIME_CODES = {'FULLTIME': 0, 'PARTTIME': 1, 'PROJECT': 2}
+    TIME_SCORES = ((10, 5, 4), (5, 10, 5), (4, 5, 10))
+
+    def __init__(self, capacity=1024) -> None:
+        self.size = 0
+        self.rows = {}
+        self.ids = np.zeros(capacity, dtype=np.int64)
+        self.min_age = np.zeros(capacity, dtype=np.int64)
+        self.max_age = np.zeros(capacity, dtype=np.int64)
+        self.salary = np.zeros(capacity, dtype=np.int64)
+        self.time_code = np.zeros(capacity, dtype=np.int8)
+        self.skill_count = np.zeros(capacity, dtype=np.int64)
+        self.skill_rows = {}
+        self._time_table = np.array(self.TIME_SCORES, dtype=np.int64)
+
+    @classmethod
+    def from_jobs(cls, jobs):
+        """Build the columns from a job table."""
+        columns = cls(max(len(jobs), 1))
+        for job in jobs.values():
+            columns.add(job)
+            for skill in job.skills:
+                columns.add_skill(job.id, skill)
+        return columns
+
+    def _grow(self):
+        """Double the capacity of every column."""
+        capacity = 2 * len(self.ids)
+        for name in ('ids', 'min_age', 'max_age', 'salary',
+                     'time_code', 'skill_count'):
+            column = getattr(self, name)
+            grown = np.zeros(capacity, dtype=column.dtype)
+            grown[:self.size] = column[:self.size]
+            setattr(self, name, grown)
+
+    def add(self, job):
+        """Append a validated job as a new row."""
+        if self.size == len(self.ids):
+            self._grow()
+        row = self.size
+        self.ids[row] = job.id
+        self.min_age[row] = job.min_age
+        self.max_age[row] = job.max_age
+        self.salary[row] = job.salary
+        self.time_code[row] = self.TIME_CODES[job.time_condition]
+        self.rows[job.id] = row
+        self.size += 1
+
+    def add_skill(self, job_id, skill):
+        """Record a new skill for an existing job."""
+        row = self.rows[job_id]
+        entry = self.skill_rows.get(skill)
+        rows, length = entry if entry is not None else (np.zeros(8, dtype=np.int64), 0)
+        if length == len(rows):
+            rows = np.concatenate((rows, np.zeros(length, dtype=np.int64)))
+        rows[length] = row
+        self.skill_rows[skill] = (rows, length + 1)
+        self.skill_count[row] += 1
+
+    def scores(self, user):
+        """Score every job for a user, in row order."""
+        size = self.size
+        age = user.age
+        age_score = np.minimum(self.max_age[:size] - age, age - self.min_age[:size])
+
+        common = np.zeros(size, dtype=np.int64)
+        for skill in set(user.skills):
+            if skill in self.skill_rows:
+                rows, length = self.skill_rows[skill]
+                common[rows[:length]] += 1
+        skill_score = 4 * common - self.skill_count[:size]
+
+        user_code = self.TIME_CODES[user.time_condition]
+        time_score = self._time_table[self.time_code[:size], user_code]
+
+        gap = np.maximum(np.abs(self.salary[:size] - user.salary), 1)
+        salary_score = 1000 // gap
+
+        score = age_score + skill_score + time_score + salary_score
+        return score * 1000 + self.ids[:size]
+
+    def top(self, user, k=JOBLIST_SIZE):
+        """Return the k best (job id, score) pairs for a user, best first."""
+        scores = self.scores(user)
+        size = self.size
+        if size > k:
+            kth = np.partition(scores, size - k)[size - k]
+            rows = np.flatnonzero(scores >= kth)
+        else:
+            rows = np.arange(size)
+        rows = rows[np.lexsort((rows, -scores[rows]))][:k]
+        return [(int(self.ids[row]), int(scores[row])) for row in rows]
+
+def rank_jobs(user, jobs, k=JOBLIST_SIZE, columns=None):
+    """Return the k best (job id, score) pairs for a user, best first."""
+    if columns is not None:
+        return columns.top(user, k)
+    return [(job.id, score) for job, score in top_jobs(user, jobs, k)]
+
+def _rank_key(entry):
+    """Sort key of a ranked (job id, score) pair: best score, then lowest id."""
+    return (-entry[1], entry[0])
+
+class RecommendationCache:
+    """Cached top-k job lists keyed by user id.
+
+    New jobs and new job skills are merged into the cached lists by scoring
+    only the affected job; an entry is dropped only when it can no longer be
+    repaired in place.
+
+    get may run on several threads at once, so the entries and counters are
+    guarded by a lock. A miss ranks the jobs outside of it.
+    """
+    def __init__(self, k=JOBLIST_SIZE) -> None:
+        self.k = k
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def stats(self):
+        """Return the cache counters."""
+        with self.lock:
+            return {'entries': len(self.entries), 'hits': self.hits,
+                    'misses': self.misses}
+
+    def get(self, user, jobs, columns=None):
+        """Return the top-k list of a user, ranking all jobs on a miss."""
+        with self.lock:
+            ranked = self.entries.get(user.id)
+            if ranked is not None:
+                self.hits += 1
+                return ranked
+            self.misses += 1
+        ranked = rank_jobs(user, jobs, self.k, columns)
+        with self.lock:
+            # another reader may have ranked the same user meanwhile
+            return self.entries.setdefault(user.id, ranked)
+
+    def _merge(self, ranked, job_id, score):
+        """Insert a job into a ranked list if it makes the top k."""
+        entry = (job_id, score)
+        if len(ranked) == self.k and _rank_key(entry) > _rank_key(ranked[-1]):
+            return
+        insort(ranked, entry, key=_rank_key)
+        del ranked[self.k:]
+
+    def job_added(self, job, users):
+        """Merge a new job into every cached list."""
+        with self.lock:
+            self._job_added(job, users)
+
+    def _job_added(self, job, users):
+        for user_id, ranked in self.entries.items():
+            user = users[user_id]
+            self._merge(ranked, job.id, user.score_system(user, job))
+
+    def job_skill_added(self, job, users):
+        """Re-score a job whose skills changed for every cached user."""
+        with self.lock:
+            self._job_skill_added(job, users)
+
+    def _job_skill_added(self, job, users):
+        stale = []
+        for user_id, ranked in self.entries.items():
+            user = users[user_id]
+            score = user.score_system(user, job)
+            for i, (job_id, old_score) in enumerate(ranked):
+                if job_id == job.id:
+                    if score < old_score and len(ranked) == self.k:
+                        # the job may fall below a job that is not cached
+                        stale.append(user_id)
+                    else:
+                        del ranked[i]
+                        self._merge(ranked, job.id, score)
+                    break
+            else:
+                self._merge(ranked, job.id, score)
+        for user_id in stale:
+            del self.entries[user_id]
+
+    def user_skill_added(self, user_id):
+        """Drop the cached list of a user whose skills changed."""
+        with self.lock:
+            self.entries.pop(user_id, None)
+
+def format_ranking(ranked):
+    """Format ranked (id, score) pairs as one output line."""
+    output = []
+    for entry_id, score in ranked:
+        output.append(f"({entry_id},{score})")
+    return ''.join(output)
+
+def get_joblist(user_id, users, jobs, k=JOBLIST_SIZE, columns=None, cache=None):
+    """Return the k best jobs of a user as one line."""
+    if user_id not in users:
+        return "invalid index"
+
+    user = users[user_id]
+    if cache is not None and cache.k == k:
+        ranked = cache.get(user, jobs, columns)
     else:
-        print(f"{user.name}-")
+        ranked = rank_jobs(user, jobs, k, columns)
+
+    return format_ranking(ranked)
+
+_batch_state = None
+
+def _rank_shard(user_ids):
+    """Rank the jobs of a shard of users with the state shared by the parent."""
+    users, jobs, k, columns = _batch_state
+    return [(user_id, rank_jobs(users[user_id], jobs, k, columns))
+            for user_id in user_ids]
+
+def all_joblists(users, jobs, k=JOBLIST_SIZE, columns=None, processes=None,
+                 shard_size=SHARD_SIZE):
+    """Yield (user id, ranked jobs) for every user, in user-id order.
+
+    Users are split into shards ranked by a process pool. The job table is
+    not pickled: workers are forked after it is published in _batch_state
+    and read it through copy-on-write memory. Without fork, or with a
+    single process, the shards are ranked in this process.
+    """
+    global _batch_state
+    user_ids = sorted(users)
+    shards = [user_ids[i:i + shard_size] for i in range(0, len(user_ids), shard_size)]
+    _batch_state = (users, jobs, k, columns)
+    try:
+        if (processes == 1 or len(shards) < 2
+                or 'fork' not in multiprocessing.get_all_start_methods()):
+            for shard in shards:
+                yield from _rank_shard(shard)
+            return
+        with multiprocessing.get_context('fork').Pool(processes) as pool:
+            for ranked_shard in pool.imap(_rank_shard, shards):
+                yield from ranked_shard
+    finally:
+        _batch_state = None
+
+class UserIndex:
+    """Users indexed by age and salary bucket for ranking users per job.
+
+    score_system splits into an age term, which only depends on the age,
+    a salary term, which is 1000 for an equal salary, 1 for a salary one
+    bucket away and 0 otherwise, and skill and time terms with fixed upper
+    bounds. That lets whole age buckets be skipped without changing the
+    exact result.
+    """
+    def __init__(self) -> None:
+        self.ages = []
+        self.by_age = {}
+        self.by_salary = {}
+
+    def add(self, user):
+        """Index a validated user."""
+        if user.age not in self.by_age:
+            insort(self.ages, user.age)
+            self.by_age[user.age] = []
+        self.by_age[user.age].append(user)
+        self.by_salary.setdefault(user.salary // 1000, []).append(user)
+
+    def top(self, job, k=JOBLIST_SIZE):
+        """Return the k best (user id, score) pairs for a job, best first."""
+        best = []
+
+        def offer(user):
+            entry = (user.score_system(user, job), -user.id)
+            if len(best) < k:
+                heapq.heappush(best, entry)
+            elif entry > best[0]:
+                heapq.heapreplace(best, entry)
+
+        salary_bucket = job.salary // 1000
+        for user in self.by_salary.get(salary_bucket, ()):
+            offer(user)
+
+        def age_score(age):
+            return min(job.max_age - age, age - job.min_age)
+
+        # best possible skill, time and salary terms outside the salary bucket
+        bonus = 3 * job._skill_mask.bit_count() + 10 + 1
+        for age in sorted(self.ages, key=age_score, reverse=True):
+            bound = (age_score(age) + bonus) * 1000 + job.id
+            if len(best) == k and bound < best[0][0]:
+                break
+            for user in self.by_age[age]:
+                if user.salary // 1000 != salary_bucket:
+                    offer(user)
+
+        return [(-user_id, score) for score, user_id in sorted(best, reverse=True)]
+
+def get_userlist(job_id, jobs, index, k=JOBLIST_SIZE):
+    """Return the k best users of a job as one line."""
+    if job_id not in jobs:
+        return "invalid index"
+
+    return format_ranking(index.top(jobs[job_id], k))
 
 def add_job_skill(job_id, skill):
     """adding job skills"""
@@ -476,11 +849,14 @@ def add_job_skill(job_id, skill):
         raise JobAndUserError("invalid skill")
 
     job = jobs[job_id]
-    if skill in job.skills:
+    if job.has_skill(skill):
         raise JobAndUserError("repeated skill")
 
-    job.skills.append(skill)
-    print("skill added")
+    job.add_skill(skill)
+    if job_columns is not None:
+        job_columns.add_skill(job_id, skill)
+    recommendations.job_skill_added(job, users)
+    return "skill added"
 
 def add_user_skill(user_id, skill):
     """adding user skills"""
@@ -491,81 +867,418 @@ def add_user_skill(user_id, skill):
         raise JobAndUserError("invalid skill")
 
     user = users[user_id]
-    if skill in user.skills:
+    if user.has_skill(skill):
         raise JobAndUserError("repeated skill")
 
-    user.skills.append(skill)
-    print("skill added")
+    user.add_skill(skill)
+    recommendations.user_skill_added(user_id)
+    return "skill added"
 
 
 users = {}
 jobs = {}
-
-num_skills = int(input())
-global_skills = input().split()[:num_skills]
-
-global_skills_set = set(global_skills)
-
-n = int(input())
-for _ in range(n):
-    command, *data = input().split()
+global_skills = []
+global_skills_set = set()
+job_columns = JobColumns() if np is not None else None
+recommendations = RecommendationCache()
+user_index = UserIndex()
+
+def add_global_skills(skills):
+    """Register the skills of an input header."""
+    for skill in skills:
+        if skill not in global_skills_set:
+            global_skills.append(skill)
+            global_skills_set.add(skill)
+        skill_bit(skill)
+
+def snapshot_state():
+    """Return the whole in-memory state as a picklable dict."""
+    return {
+        'skills': global_skills,
+        'skill_bits': skill_bits,
+        'job_counter': Job._id_counter,
+        'user_counter': User._id_counter,
+        'users': users,
+        'jobs': jobs,
+    }
+
+def restore_state(state):
+    """Load a snapshot into the empty in-memory state and rebuild the indexes."""
+    skill_bits.update(state['skill_bits'])
+    add_global_skills(state['skills'])
+    Job._id_counter = state['job_counter']
+    User._id_counter = state['user_counter']
+    users.update(state['users'])
+    jobs.update(state['jobs'])
+    for job in jobs.values():
+        if job_columns is not None:
+            job_columns.add(job)
+            for skill in job.skills:
+                job_columns.add_skill(job.id, skill)
+    for user in users.values():
+        user_index.add(user)
+
+class Journal:
+    """Append-only journal of state-changing commands with periodic snapshots.
+
+    Every record is a type byte, a little-endian payload length and the
+    UTF-8 payload: an input skill header or a command line. A snapshot
+    pickles the state together with the journal offset it covers, so a
+    restart only replays the records written after it.
+    """
+    RECORD = struct.Struct('<cI')
+    SKILLS = b'S'
+    COMMAND = b'C'
+
+    def __init__(self, directory, snapshot_every=SNAPSHOT_EVERY) -> None:
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, 'journal.bin')
+        self.snapshot_path = os.path.join(directory, 'snapshot.pickle')
+        self.snapshot_every = snapshot_every
+        self.since_snapshot = 0
+        self.file = None
+
+    def _records(self, offset):
+        """Yield (end offset, type, payload) of the records after offset."""
+        with open(self.path, 'rb') as f:
+            f.seek(offset)
+            data = f.read()
+        position = 0
+        while position + self.RECORD.size <= len(data):
+            kind, length = self.RECORD.unpack_from(data, position)
+            end = position + self.RECORD.size + length
+            if end > len(data):
+                break  # torn write at the end of the journal
+            yield offset + end, kind, data[position + self.RECORD.size:end].decode()
+            position = end
+
+    def restore(self):
+        """Load the latest snapshot, replay the journal tail and open it for appending.
+
+        Returns the snapshot offset, the number of replayed records and the
+        time to ready in seconds.
+        """
+        start = time.perf_counter()
+        offset = 0
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, 'rb') as f:
+                state = pickle.load(f)
+            restore_state(state)
+            offset = state['offset']
+
+        end = offset
+        replayed = 0
+        if os.path.exists(self.path):
+            for end, kind, payload in self._records(offset):
+                if kind == self.SKILLS:
+                    add_global_skills(payload.split())
+                else:
+                    command, *data = payload.split()
+                    try:
+                        COMMANDS[command](*data)
+                    except JobAndUserError:
+                        pass
+                replayed += 1
+
+        self.file = open(self.path, 'ab')
+        if self.file.tell() < end:
+            # the journal lost records the snapshot covers: start a new base
+            self.snapshot()
+        else:
+            self.file.truncate(end)
+            self.file.seek(0, os.SEEK_END)
+            self.since_snapshot = replayed
+        return offset, replayed, time.perf_counter() - start
+
+    def _append(self, kind, payload):
+        """Append one record."""
+        payload = payload.encode()
+        self.file.write(self.RECORD.pack(kind, len(payload)))
+        self.file.write(payload)
+
+    def record_skills(self, skills):
+        """Journal an input skill header."""
+        self._append(self.SKILLS, ' '.join(skills))
+
+    def record_command(self, line):
+        """Journal a command line, taking a snapshot when one is due."""
+        self._append(self.COMMAND, line)
+        self.since_snapshot += 1
+        if self.since_snapshot >= self.snapshot_every:
+            self.snapshot()
+
+    def snapshot(self):
+        """Write a snapshot of the current state atomically."""
+        self.file.flush()
+        state = snapshot_state()
+        state['offset'] = self.file.tell()
+        temp_path = self.snapshot_path + '.tmp'
+        with open(temp_path, 'wb') as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, self.snapshot_path)
+        self.since_snapshot = 0
+
+    def close(self):
+        """Flush and close the journal."""
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+class CommandStats:
+    """Per-command counts and latency histograms, with optional profiles.
+
+    Latencies go into power-of-two nanosecond buckets, so p50 and p99 are
+    reported as the upper bound of their bucket while max is exact. When
+    profile_slowest is set, every command runs under cProfile and the
+    profiles of the slowest ones are kept for the report.
+    """
+    def __init__(self, profile_slowest=0) -> None:
+        self.commands = {}
+        self.profile_slowest = profile_slowest
+        self.slowest = []
+        self._profiler = None
+
+    def start(self):
+        """Start timing a command."""
+        if self.profile_slowest:
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        return time.perf_counter_ns()
+
+    def stop(self, command, line, started):
+        """Record the latency of a command started with start()."""
+        elapsed = time.perf_counter_ns() - started
+        entry = self.commands.get(command)
+        if entry is None:
+            entry = self.commands[command] = {'count': 0, 'total': 0, 'max': 0, 'buckets': {}}
+        entry['count'] += 1
+        entry['total'] += elapsed
+        entry['max'] = max(entry['max'], elapsed)
+        bucket = elapsed.bit_length()
+        entry['buckets'][bucket] = entry['buckets'].get(bucket, 0) + 1
+
+        if self._profiler is not None:
+            self._profiler.disable()
+            slow = (elapsed, line, self._profiler)
+            if len(self.slowest) < self.profile_slowest:
+                heapq.heappush(self.slowest, slow)
+            elif elapsed > self.slowest[0][0]:
+                heapq.heapreplace(self.slowest, slow)
+            self._profiler = None
+
+    @staticmethod
+    def _percentile(entry, fraction):
+        """Return the bucket bound of a latency percentile, in nanoseconds."""
+        rank = fraction * entry['count']
+        seen = 0
+        for bucket in sorted(entry['buckets']):
+            seen += entry['buckets'][bucket]
+            if seen >= rank:
+                return min(1 << bucket, entry['max'])
+        return entry['max']
+
+    def summary(self):
+        """Return the statistics as a JSON-friendly dict, times in seconds."""
+        commands = {}
+        for command, entry in sorted(self.commands.items()):
+            commands[command] = {
+                'count': entry['count'],
+                'total': entry['total'] / 1e9,
+                'p50': self._percentile(entry, 0.50) / 1e9,
+                'p99': self._percentile(entry, 0.99) / 1e9,
+                'max': entry['max'] / 1e9,
+            }
+        slowest = []
+        for elapsed, line, profiler in sorted(self.slowest, key=lambda x: x[0], reverse=True):
+            stream = io.StringIO()
+            pstats.Stats(profiler, stream=stream).sort_stats('cumulative').print_stats(15)
+            slowest.append({'command': line, 'seconds': elapsed / 1e9,
+                            'profile': stream.getvalue()})
+        return {'commands': commands, 'slowest': slowest,
+                'recommendations': recommendations.stats()}
+
+    def report(self, target='-'):
+        """Write the summary to stderr, or as JSON to a file path."""
+        summary = self.summary()
+        if target != '-':
+            with open(target, 'w', encoding='utf-8') as f:
+                json.dump(summary, f, indent=2)
+            return
+        print(f"{'command':<18}{'count':>10}{'p50 ms':>12}{'p99 ms':>12}{'max ms':>12}",
+              file=sys.stderr)
+        for command, entry in summary['commands'].items():
+            print(f"{command:<18}{entry['count']:>10}{entry['p50'] * 1e3:>12.3f}"
+                  f"{entry['p99'] * 1e3:>12.3f}{entry['max'] * 1e3:>12.3f}", file=sys.stderr)
+        print(f"recommendations: {summary['recommendations']}", file=sys.stderr)
+        for slow in summary['slowest']:
+            print(f"\n{slow['command']} took {slow['seconds'] * 1e3:.3f} ms", file=sys.stderr)
+            print(slow['profile'], file=sys.stderr)
+
+def read_lines(stream, chunk_size=CHUNK_SIZE):
+    """Yield the decoded lines of a binary stream, reading it in large chunks."""
+    tail = b''
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        lines = (tail + chunk).split(b'\n')
+        tail = lines.pop()
+        for line in lines:
+            yield line.decode()
+    if tail:
+        yield tail.decode()
+
+def add_job(name, min_age, max_age, time_condition, salary, *_):
+    """Add a job from the ADD-JOB arguments."""
+    job = Job(name, int(min_age), int(max_age), time_condition, int(salary))
+    job.validate()
+    jobs[job.id] = job
+    if job_columns is not None:
+        job_columns.add(job)
+    recommendations.job_added(job, users)
+    return f"job id is {job.id}"
+
+def add_user(name, age, time_condition, salary, *_):
+    """Add a user from the ADD-USER arguments."""
+    user = User(name, int(age), time_condition, int(salary))
+    user.validate()
+    users[user.id] = user
+    user_index.add(user)
+    return f"user id is {user.id}"
+
+def view(user_id, job_id, *_):
+    """Track a user viewing a job."""
+    user_id = int(user_id)
+    job_id = int(job_id)
+    if user_id not in users:
+        return "invalid index"
+    return users[user_id].view_job(job_id, jobs)
+
+def get_all_joblists(processes=None, *_):
+    """Yield the GET-JOBLIST line of every user, prefixed by the user id."""
+    if processes is not None:
+        processes = int(processes)
+    for user_id, ranked in all_joblists(users, jobs, columns=job_columns,
+                                        processes=processes):
+        yield f"{user_id} {format_ranking(ranked)}"
+
+COMMANDS = {
+    "ADD-JOB": add_job,
+    "ADD-USER": add_user,
+    "ADD-JOB-SKILL": lambda job_id, skill, *_: add_job_skill(int(job_id), skill),
+    "ADD-USER-SKILL": lambda user_id, skill, *_: add_user_skill(int(user_id), skill),
+    "VIEW": view,
+    "JOB-STATUS": lambda job_id, *_: job_status(int(job_id), jobs),
+    "USER-STATUS": lambda user_id, *_: user_status(int(user_id), users),
+    "GET-JOBLIST": lambda user_id, *_: get_joblist(
+        int(user_id), users, jobs, columns=job_columns, cache=recommendations),
+    "GET-USERLIST": lambda job_id, *_: get_userlist(int(job_id), jobs, user_index),
+    "GET-ALL-JOBLISTS": get_all_joblists,
+}
+
+def process(lines, write, flush_every=FLUSH_EVERY, journal=None, stats=None):
+    """Run the commands of an input stream, writing the output in batches."""
+    num_skills = int(next(lines))
+    header = next(lines).split()[:num_skills]
+    add_global_skills(header)
+    if journal is not None:
+        journal.record_skills(header)
+
+    n = int(next(lines))
+    output = []
+
+    def emit(line):
+        output.append(line)
+        if len(output) >= flush_every:
+            write('\n'.join(output) + '\n')
+            output.clear()
 
     try:
-        if command == "ADD-JOB":
-            job = Job(data[0], int(data[1]), int(data[2]), data[3], int(data[4]))
-            job.validate()
-            jobs[job.id] = job
-            print(f"job id is {job.id}")
-
-        elif command == "ADD-USER":
-            user = User(data[0], int(data[1]), data[2], int(data[3]))
-            user.validate()
-            users[user.id] = user
-            print(f"user id is {user.id}")
-
-        elif command == "ADD-JOB-SKILL":
-            add_job_skill(int(data[0]), data[1])
-
-        elif command == "ADD-USER-SKILL":
-            add_user_skill(int(data[0]), data[1])
-
-        elif command == "VIEW":
-            user_id = int(data[0])
-            job_id = int(data[1])
-            if user_id in users:
-                users[user_id].view_job(job_id, jobs)
-            else:
-                print("invalid index")
-
-        elif command == "JOB-STATUS":
-            job_id = int(data[0])
-            job_status(job_id, jobs)
-
-        elif command == "USER-STATUS":
-            user_id = int(data[0])
-            user_status(user_id, users)
-
-        elif command == "GET-JOBLIST":
-            user_id = int(data[0])
-
-            if user_id not in users:
-                print("invalid index")
+        for _ in range(n):
+            line = next(lines, None)
+            if line is None:
+                raise EOFError("EOF when reading a line")
+            command, *data = line.split()
+            handler = COMMANDS.get(command)
+            if handler is None:
                 continue
+            if stats is not None:
+                started = stats.start()
+            try:
+                result = handler(*data)
+                if isinstance(result, str):
+                    emit(result)
+                else:
+                    for result_line in result:
+                        emit(result_line)
+            except JobAndUserError as e:
+                emit(str(e))
+            if stats is not None:
+                stats.stop(command, line, started)
+            if journal is not None and command in JOURNALED:
+                journal.record_command(line)
+    finally:
+        if output:
+            write('\n'.join(output) + '\n')
+
+def stats_target(option, environ):
+    """Return where to report the command stats: a path, '-' for stderr, or None.
+
+    --stats wins over the environment. $JOB_OFFER_STATS only switches the
+    report on or off, and $JOB_OFFER_STATS_FILE names the JSON file.
+    """
+    if option is not None:
+        return option
+    switch = environ.get(STATS_ENV)
+    path = environ.get(STATS_FILE_ENV) or None
+    if switch is None:
+        return path
+    switch = switch.strip().lower()
+    if switch in STATS_OFF:
+        return None
+    if switch not in STATS_ON:
+        raise ValueError(f"${STATS_ENV} must be 0 or 1, not {switch!r}; "
+                         f"set ${STATS_FILE_ENV} to write the stats to a file")
+    return path or '-'
+
+def main():
+    """Process the commands from stdin."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--journal', metavar='DIR',
+                        help='journal state changes in DIR and restore from it on start')
+    parser.add_argument('--snapshot-every', type=int, default=SNAPSHOT_EVERY,
+                        metavar='N', help='snapshot after N journaled commands')
+    parser.add_argument('--stats', nargs='?', const='-', metavar='FILE',
+                        help='report per-command latencies on exit, to stderr or '
+                             f'as JSON to FILE (also enabled by ${STATS_ENV}=1, '
+                             f'with the file from ${STATS_FILE_ENV})')
+    parser.add_argument('--profile-slowest', type=int, default=0, metavar='N',
+                        help='profile every command and report the N slowest')
+    args = parser.parse_args()
 
-            user = users[user_id]
-            job_scores = []
-
-            for job_id, job in jobs.items():
-                score = user.score_system(user, job)
-                job_scores.append((job, score))
-
-            job_scores.sort(key=lambda x: x[1], reverse=True)
-
-            top_jobs = job_scores[:5]
-
-            output = []
-            for job, score in top_jobs:
-                output.append(f"({job.id},{score})")
-            print(''.join(output))
-    except JobAndUserError as e:
-        print(e)
+    try:
+        target = stats_target(args.stats, os.environ)
+    except ValueError as e:
+        parser.error(str(e))
+    stats = None
+    if target or args.profile_slowest:
+        stats = CommandStats(args.profile_slowest)
+
+    journal = None
+    if args.journal:
+        journal = Journal(args.journal, args.snapshot_every)
+        offset, replayed, elapsed = journal.restore()
+        print(f"ready in {elapsed:.3f}s (snapshot offset {offset}, "
+              f"{replayed} journal records replayed)", file=sys.stderr)
+    try:
+        process(read_lines(sys.stdin.buffer), sys.stdout.write,
+                journal=journal, stats=stats)
+    finally:
+        sys.stdout.flush()
+        if journal is not None:
+            journal.close()
+        if stats is not None:
+            stats.report(target or '-')
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+randomized regression checks of the indexed and cached paths against full scans
+"""
+import random
+
+import main
+from main import JOBLIST_SIZE, JobAndUserError, rank_jobs
+
+SKILLS = [f"skill{i}" for i in range(12)]
+TIME_CONDITIONS = ['FULLTIME', 'PARTTIME', 'PROJECT']
+
+def reset():
+    """
+    start from an empty job and user table
+    """
+    main.users.clear()
+    main.jobs.clear()
+    main.job_columns = main.JobColumns() if main.np is not None else None
+    main.recommendations = main.RecommendationCache()
+    main.user_index = main.UserIndex()
+    main.add_global_skills(SKILLS)
+
+def random_command(rng):
+    """
+    return a random state changing command as (handler, arguments)
+    """
+    choice = rng.random()
+    if choice < 0.25 or not main.jobs:
+        min_age = rng.randint(18, 50)
+        return main.add_job, ("job", min_age, rng.randint(min_age, 65),
+                              rng.choice(TIME_CONDITIONS), rng.randint(0, 20) * 1000)
+    if choice < 0.5 or not main.users:
+        return main.add_user, ("user", rng.randint(18, 65),
+                               rng.choice(TIME_CONDITIONS), rng.randint(0, 20) * 1000)
+    if choice < 0.8:
+        return main.add_job_skill, (rng.choice(list(main.jobs)), rng.choice(SKILLS))
+    return main.add_user_skill, (rng.choice(list(main.users)), rng.choice(SKILLS))
+
+def random_steps(rng, steps):
+    """
+    apply random commands to a fresh table, yielding after each one
+    """
+    reset()
+    for _ in range(steps):
+        handler, arguments = random_command(rng)
+        try:
+            handler(*arguments)
+        except JobAndUserError:
+            pass  # a repeated skill
+        yield
+
+def test_recommendation_cache(rounds=20, steps=200, seed=0):
+    """
+    to test that GET-JOBLIST through the cache matches a fresh ranking
+    after every ADD-JOB, ADD-USER, ADD-JOB-SKILL and ADD-USER-SKILL
+    """
+    rng = random.Random(seed)
+    for _ in range(rounds):
+        for _ in random_steps(rng, steps):
+            # a few lookups, so that most users have a cached list to repair
+            for user_id in rng.sample(list(main.users), min(3, len(main.users))):
+                user = main.users[user_id]
+                cached = main.recommendations.get(user, main.jobs, main.job_columns)
+                assert cached == rank_jobs(user, main.jobs), (user_id, cached)
+
+    print("recommendation cache: all tests passed!")
+
+def full_scan_users(job, k=JOBLIST_SIZE):
+    """
+    rank every user for a job, best score then lowest id first
+    """
+    ranked = sorted(((user.id, user.score_system(user, job))
+                     for user in main.users.values()),
+                    key=lambda entry: (-entry[1], entry[0]))
+    return ranked[:k]
+
+def test_user_index(rounds=20, steps=200, seed=1):
+    """
+    to test that GET-USERLIST through the age and salary index matches
+    a scan over every user
+    """
+    rng = random.Random(seed)
+    for _ in range(rounds):
+        for _ in random_steps(rng, steps):
+            for job_id in rng.sample(list(main.jobs), min(3, len(main.jobs))):
+                job = main.jobs[job_id]
+                for k in (1, JOBLIST_SIZE):
+                    top = main.user_index.top(job, k)
+                    assert top == full_scan_users(job, k), (job_id, k, top)
+
+    print("user index: all tests passed!")
+
+if __name__ == '__main__':
+    test_recommendation_cache()
+    test_user_index()
@@ -0,0 +1,154 @@
+"""
+Job Offer System server
+
+Serves the command language of main.py over TCP and Unix sockets. Every
+request line gets exactly one response line. All connections share the
+in-memory state of main.py: commands that change it run one at a time on
+the event loop, while reads run concurrently in a thread pool.
+"""
+import argparse
+import asyncio
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+
+import main
+
+READ_COMMANDS = frozenset(("JOB-STATUS", "USER-STATUS", "GET-JOBLIST", "GET-USERLIST"))
+WRITE_COMMANDS = main.JOURNALED
+READ_THREADS = 8
+
+class ReadWriteLock:
+    """Many concurrent readers or a single writer, for asyncio tasks.
+
+    Waiting writers hold back new readers so writes are not starved.
+    """
+    def __init__(self) -> None:
+        self._readers = 0
+        self._writer = False
+        self._waiting_writers = 0
+        self._changed = asyncio.Condition()
+
+    @contextlib.asynccontextmanager
+    async def read(self):
+        """Hold the lock for reading."""
+        async with self._changed:
+            await self._changed.wait_for(
+                lambda: not self._writer and not self._waiting_writers)
+            self._readers += 1
+        try:
+            yield
+        finally:
+            async with self._changed:
+                self._readers -= 1
+                if not self._readers:
+                    self._changed.notify_all()
+
+    @contextlib.asynccontextmanager
+    async def write(self):
+        """Hold the lock for writing."""
+        async with self._changed:
+            self._waiting_writers += 1
+            try:
+                await self._changed.wait_for(
+                    lambda: not self._writer and not self._readers)
+            finally:
+                self._waiting_writers -= 1
+            self._writer = True
+        try:
+            yield
+        finally:
+            async with self._changed:
+                self._writer = False
+                self._changed.notify_all()
+
+def run_command(command, data):
+    """Run one command and return its response line."""
+    try:
+        return main.COMMANDS[command](*data)
+    except main.JobAndUserError as e:
+        return str(e)
+    except (ValueError, TypeError):
+        return "invalid command"
+
+class JobServer:
+    """Shared state and connection handling for the line-protocol server."""
+    def __init__(self, journal=None, read_threads=READ_THREADS) -> None:
+        self.lock = ReadWriteLock()
+        self.executor = ThreadPoolExecutor(read_threads)
+        self.journal = journal
+
+    async def execute(self, line):
+        """Run a request line and return its response line."""
+        command, *data = line.split() or ("",)
+        if command in READ_COMMANDS:
+            async with self.lock.read():
+                return await asyncio.get_running_loop().run_in_executor(
+                    self.executor, run_command, command, data)
+        if command in WRITE_COMMANDS:
+            async with self.lock.write():
+                response = run_command(command, data)
+                if self.journal is not None and response != "invalid command":
+                    self.journal.record_command(line)
+                return response
+        return "invalid command"
+
+    async def handle(self, reader, writer):
+        """Serve one connection until the client closes it."""
+        try:
+            while line := await reader.readline():
+                response = await self.execute(line.decode().strip())
+                writer.write(response.encode() + b'\n')
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+async def serve(args, journal):
+    """Start the listeners and serve until cancelled."""
+    server = JobServer(journal, args.read_threads)
+    listeners = []
+    if args.tcp:
+        host, _, port = args.tcp.rpartition(':')
+        listeners.append(await asyncio.start_server(server.handle, host or None, int(port)))
+    if args.unix:
+        listeners.append(await asyncio.start_unix_server(server.handle, args.unix))
+    for listener in listeners:
+        for sock in listener.sockets:
+            print(f"listening on {sock.getsockname()}", flush=True)
+    try:
+        await asyncio.gather(*(listener.serve_forever() for listener in listeners))
+    finally:
+        server.executor.shutdown()
+
+def main_cli():
+    """Parse the command line and run the server."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--skills', nargs='*', default=[], help='the global skill list')
+    parser.add_argument('--tcp', metavar='[HOST]:PORT', help='listen on a TCP address')
+    parser.add_argument('--unix', metavar='PATH', help='listen on a Unix socket')
+    parser.add_argument('--journal', metavar='DIR',
+                        help='journal state changes in DIR and restore from it on start')
+    parser.add_argument('--snapshot-every', type=int, default=main.SNAPSHOT_EVERY, metavar='N')
+    parser.add_argument('--read-threads', type=int, default=READ_THREADS, metavar='N')
+    args = parser.parse_args()
+    if not args.tcp and not args.unix:
+        parser.error('give --tcp and/or --unix')
+
+    journal = None
+    if args.journal:
+        journal = main.Journal(args.journal, args.snapshot_every)
+        journal.restore()
+    main.add_global_skills(args.skills)
+    if journal is not None:
+        journal.record_skills(args.skills)
+    try:
+        asyncio.run(serve(args, journal))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if journal is not None:
+            journal.close()
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,106 @@
+"""
+Synthetic workload generator for the job offer system
+
+Writes a seeded main.py input: the skill header, a population of jobs and
+users with skills drawn from a skewed popularity curve, then a mix of
+reads and writes where VIEW and GET-JOBLIST come in a chosen ratio.
+"""
+import argparse
+import random
+import sys
+
+TIME_CONDITIONS = ('FULLTIME', 'PARTTIME', 'PROJECT')
+NAME_LETTERS = 'abcdefghijklmnopqrstuvwxyz'
+
+def random_name(rng):
+    """Return a valid random name."""
+    return ''.join(rng.choices(NAME_LETTERS, k=rng.randint(3, 10)))
+
+def generate(seed=0, users=1000, jobs=1000, skills=100, commands=10_000, view_ratio=4.0):
+    """Yield the lines of a workload.
+
+    commands is the length of the mixed phase after the population, in
+    which VIEW and GET-JOBLIST make up 80% of the commands, in a
+    view_ratio to one proportion.
+    """
+    rng = random.Random(seed)
+    vocabulary = [f"skill{i}" for i in range(skills)]
+    popularity = [1 / (i + 1) for i in range(skills)]
+
+    def skill_set(count):
+        return set(rng.choices(vocabulary, weights=popularity, k=count))
+
+    def add_job():
+        min_age = rng.randint(18, 50)
+        return (f"ADD-JOB {random_name(rng)} {min_age} {rng.randint(min_age, 65)} "
+                f"{rng.choice(TIME_CONDITIONS)} {rng.randint(1, 100) * 1000}")
+
+    def add_user():
+        return (f"ADD-USER {random_name(rng)} {rng.randint(18, 65)} "
+                f"{rng.choice(TIME_CONDITIONS)} {rng.randint(1, 100) * 1000}")
+
+    body = []
+    for job_id in range(1, jobs + 1):
+        body.append(add_job())
+        body.extend(f"ADD-JOB-SKILL {job_id} {skill}" for skill in skill_set(rng.randint(1, 5)))
+    for user_id in range(1, users + 1):
+        body.append(add_user())
+        body.extend(f"ADD-USER-SKILL {user_id} {skill}" for skill in skill_set(rng.randint(1, 8)))
+
+    view_share = 0.8 * view_ratio / (view_ratio + 1)
+    mix = (('VIEW', view_share), ('GET-JOBLIST', 0.8 - view_share),
+           ('JOB-STATUS', 0.06), ('USER-STATUS', 0.06), ('ADD-JOB', 0.02),
+           ('ADD-USER', 0.02), ('ADD-JOB-SKILL', 0.02), ('ADD-USER-SKILL', 0.02))
+    names = [name for name, _ in mix]
+    weights = [weight for _, weight in mix]
+    for command in rng.choices(names, weights=weights, k=commands):
+        user_id = rng.randint(1, max(users, 1))
+        job_id = rng.randint(1, max(jobs, 1))
+        if command == 'VIEW':
+            body.append(f"VIEW {user_id} {job_id}")
+        elif command in ('GET-JOBLIST', 'USER-STATUS'):
+            body.append(f"{command} {user_id}")
+        elif command == 'JOB-STATUS':
+            body.append(f"JOB-STATUS {job_id}")
+        elif command == 'ADD-JOB':
+            body.append(add_job())
+            jobs += 1
+        elif command == 'ADD-USER':
+            body.append(add_user())
+            users += 1
+        elif command == 'ADD-JOB-SKILL':
+            body.append(f"ADD-JOB-SKILL {job_id} {rng.choice(vocabulary)}")
+        else:
+            body.append(f"ADD-USER-SKILL {user_id} {rng.choice(vocabulary)}")
+
+    yield str(len(vocabulary))
+    yield ' '.join(vocabulary)
+    yield str(len(body))
+    yield from body
+
+def add_arguments(parser):
+    """Add the workload options to an argument parser."""
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--jobs', type=int, default=1000)
+    parser.add_argument('--skills', type=int, default=100, help='skill vocabulary size')
+    parser.add_argument('--commands', type=int, default=10_000,
+                        help='commands after the initial population')
+    parser.add_argument('--view-ratio', type=float, default=4.0,
+                        help='VIEW commands per GET-JOBLIST command')
+
+def workload_params(args):
+    """Return the generate() keyword arguments of parsed options."""
+    return {'seed': args.seed, 'users': args.users, 'jobs': args.jobs,
+            'skills': args.skills, 'commands': args.commands,
+            'view_ratio': args.view_ratio}
+
+def main():
+    """Write a workload to stdout."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    add_arguments(parser)
+    for line in generate(**workload_params(parser.parse_args())):
+        sys.stdout.write(line + '\n')
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+import argparse
+import os
+import random
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import repeat
+
+import main
+from main import Catalog,execute,open_store
+
+BASELINE_QUERIES=10
+THREADS=(1,4,8)
+QUALITIES=["720p","1080p","4K"]
+
+
+def build_graph(catalog,movies,casts,edges,rng):
+    for i in range(movies):
+        catalog.add_movie(f"m{i}",rng.randint(1888,2024),rng.choice(QUALITIES))
+    for _ in range(casts):
+        catalog.add_cast("cast")
+    linked=0
+    while linked<edges:
+        try:
+            catalog.link(rng.randrange(catalog.last_cast_id),rng.randrange(catalog.last_movie_id))
+            linked+=1
+        except main.AlreadyLink:
+            pass
+
+
+def bfs_distance(catalog,source,target):
+    # plain one-directional BFS, as a baseline for the bidirectional search
+    seen={source:0}
+    queue=deque([source])
+    while queue:
+        cast_id=queue.popleft()
+        if cast_id==target:
+            return seen[cast_id]
+        for movie_id in catalog.casts[cast_id].movies:
+            for neighbour in catalog.movies[movie_id].casts:
+                if neighbour not in seen:
+                    seen[neighbour]=seen[cast_id]+1
+                    queue.append(neighbour)
+    return None
+
+
+def timed(function,arguments):
+    start=time.perf_counter()
+    results=[function(*x) for x in arguments]
+    return time.perf_counter()-start,results
+
+
+def graph(args,rng):
+    catalog=Catalog()
+    start=time.perf_counter()
+    build_graph(catalog,args.movies,args.casts,args.edges,rng)
+    print(f"built {args.edges} links in {time.perf_counter()-start:.2f}s")
+
+    cast_ids=list(catalog.casts)
+    singles=[(rng.choice(cast_ids),) for _ in range(args.queries)]
+    pairs=[(rng.choice(cast_ids),rng.choice(cast_ids)) for _ in range(args.queries)]
+
+    for label,function,arguments in (("CO-STARS",catalog.co_stars,singles),("PATH",catalog.path,pairs)):
+        cold,results=timed(function,arguments)
+        warm,_=timed(function,arguments)
+        print(f"{label:<9} {args.queries} queries: {cold*1e3/args.queries:8.3f} ms each, "
+              f"{warm*1e6/args.queries:8.3f} us cached")
+        if label=="PATH":
+            # the one-directional baseline is slow, so it only runs a sample
+            sample=[(catalog,)+x for x in arguments[:BASELINE_QUERIES]]
+            baseline,distances=timed(bfs_distance,sample)
+            for found,distance in zip(results,distances):
+                assert (found is None and distance is None) or len(found)==2*distance+1
+            print(f"{'BFS':<9} {len(sample)} queries: {baseline*1e3/len(sample):8.3f} ms each "
+                  f"(one-directional baseline)")
+
+
+def command_mix(catalog,count,writes,rng):
+    # SHOW-* and selective filters, with a share of links that take the write lock
+    lines=[]
+    for _ in range(count):
+        movie_id=rng.randrange(catalog.last_movie_id)
+        cast_id=rng.randrange(catalog.last_cast_id)
+        c=rng.random()
+        if c<writes:
+            lines.append(f"LINK-CAST-TO-MOVIE {cast_id} {movie_id}")
+        elif c<0.35:
+            lines.append(f"SHOW-MOVIE {movie_id}")
+        elif c<0.7:
+            lines.append(f"SHOW-CAST {cast_id}")
+        elif c<0.85:
+            lines.append(f"FILTER-MOVIES-BY-TITLE m{movie_id}")
+        else:
+            lines.append(f"FILTER-MOVIES TITLE m{movie_id//10} QUALITY {rng.choice(QUALITIES)}")
+    return lines
+
+
+def threads(args,rng):
+    directory=tempfile.mkdtemp() if args.db else None
+    catalog=open_store(os.path.join(directory,"movies.db")) if args.db else Catalog()
+    start=time.perf_counter()
+    build_graph(catalog,args.movies,args.casts,args.edges,rng)
+    print(f"built {args.edges} links in {time.perf_counter()-start:.2f}s")
+    lines=command_mix(catalog,args.queries,args.writes,rng)
+
+    base=None
+    for count in THREADS:
+        with ThreadPoolExecutor(count) as pool:
+            start=time.perf_counter()
+            for _ in pool.map(execute,repeat(catalog),lines,chunksize=64):
+                pass
+            elapsed=time.perf_counter()-start
+        rate=len(lines)/elapsed
+        base=base or rate
+        print(f"{count} threads: {rate:10.0f} commands/s ({rate/base:.2f}x)")
+    if catalog.store is not None:
+        catalog.store.close()
+
+
+def show_mix(count,hot,writes,rng):
+    # SHOW-MOVIE and SHOW-CAST of a few hot ids, with a share of links to them
+    lines=[]
+    for _ in range(count):
+        movie_id,cast_id=rng.randrange(hot),rng.randrange(hot)
+        c=rng.random()
+        if c<writes:
+            lines.append(f"LINK-CAST-TO-MOVIE {cast_id} {movie_id}")
+        elif c<0.5:
+            lines.append(f"SHOW-MOVIE {movie_id}")
+        else:
+            lines.append(f"SHOW-CAST {cast_id}")
+    return lines
+
+
+def run_mix(catalog,lines,cached):
+    start=time.perf_counter()
+    for line in lines:
+        if not cached:
+            # drop the rendering before every SHOW, as if there was no cache
+            command,id=line.split()[:2]
+            if command=="SHOW-MOVIE":
+                catalog.movies[int(id)].rendered=None
+            elif command=="SHOW-CAST":
+                catalog.casts[int(id)].rendered=None
+        execute(catalog,line)
+    return time.perf_counter()-start
+
+
+def show(args,rng):
+    lines=show_mix(args.queries,args.hot,args.writes,rng)
+    for cached in (False,True):
+        # the same graph for both runs
+        catalog=Catalog()
+        build_graph(catalog,args.movies,args.casts,args.edges,random.Random(args.seed))
+        elapsed=run_mix(catalog,lines,cached)
+        print(f"{'cached' if cached else 'uncached':<9} {len(lines)/elapsed:10.0f} commands/s "
+              f"({elapsed*1e6/len(lines):.2f} us each)")
+
+
+def main_cli():
+    parser=argparse.ArgumentParser(description="movie site benchmarks")
+    commands=parser.add_subparsers(dest="command",required=True)
+    graph_parser=commands.add_parser("graph",help="CO-STARS and PATH on a large cast network")
+    graph_parser.add_argument("--movies",type=int,default=100_000)
+    graph_parser.add_argument("--casts",type=int,default=200_000)
+    graph_parser.add_argument("--edges",type=int,default=1_000_000)
+    graph_parser.add_argument("--queries",type=int,default=200)
+    threads_parser=commands.add_parser("threads",help=f"command throughput at {THREADS} threads")
+    threads_parser.add_argument("--movies",type=int,default=100_000)
+    threads_parser.add_argument("--casts",type=int,default=50_000)
+    threads_parser.add_argument("--edges",type=int,default=200_000)
+    threads_parser.add_argument("--queries",type=int,default=200_000)
+    threads_parser.add_argument("--writes",type=float,default=0.01,
+                                help="share of the commands that link a cast to a movie")
+    threads_parser.add_argument("--db",action="store_true",help="keep the catalog in SQLite")
+    show_parser=commands.add_parser("show",help="a SHOW-heavy mix with and without rendering cache")
+    show_parser.add_argument("--movies",type=int,default=20_000)
+    show_parser.add_argument("--casts",type=int,default=10_000)
+    show_parser.add_argument("--edges",type=int,default=500_000)
+    show_parser.add_argument("--queries",type=int,default=200_000)
+    show_parser.add_argument("--hot",type=int,default=1000,help="ids the commands pick from")
+    show_parser.add_argument("--writes",type=float,default=0.001,
+                             help="share of the commands that link a cast to a movie")
+    for subparser in (graph_parser,threads_parser,show_parser):
+        subparser.add_argument("--seed",type=int,default=0)
+    args=parser.parse_args()
+    {"graph":graph,"threads":threads,"show":show}[args.command](args,random.Random(args.seed))
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -1,3 +1,15 @@
+import argparse
+import bisect
+import contextlib
+import heapq
+import itertools
+import operator
+import sqlite3
+import sys
+import threading
+from collections import Counter,OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
 
 class InvalidMovieTitle(BaseException):
     def __str__(self):
@@ -27,21 +39,196 @@ class AlreadyLink(BaseException):
     def __str__(self) -> str:
         return "already linked"
 
+class InvalidFilter(BaseException):
+    def __str__(self) -> str:
+        return "invalid filter"
 
-class Movie:
-    last_id=0
-    objects={}
 
-    def __init__(self,title,date,quality):
-        date=int(date)
-        Movie.validate(title,date,quality)
+class ReadWriteLock:
+    # many readers or one writer; waiting writers hold back new readers so
+    # mutations are not starved by a steady stream of queries
+    def __init__(self):
+        self.changed=threading.Condition()
+        self.readers=0
+        self.writer=False
+        self.waiting_writers=0
+
+    @contextlib.contextmanager
+    def read(self):
+        with self.changed:
+            self.changed.wait_for(lambda:not self.writer and not self.waiting_writers)
+            self.readers+=1
+        try:
+            yield
+        finally:
+            with self.changed:
+                self.readers-=1
+                if not self.readers:
+                    self.changed.notify_all()
+
+    @contextlib.contextmanager
+    def write(self):
+        with self.changed:
+            self.waiting_writers+=1
+            try:
+                self.changed.wait_for(lambda:not self.writer and not self.readers)
+            finally:
+                self.waiting_writers-=1
+            self.writer=True
+        try:
+            yield
+        finally:
+            with self.changed:
+                self.writer=False
+                self.changed.notify_all()
+
+
+class SqliteStore:
+    # optional persistent catalog: the movies and casts of a Catalog become hot
+    # caches filled on demand, filters run as indexed SQL queries, and writes
+    # are committed in batches of batch_size statements
+    schema="""
+        CREATE TABLE IF NOT EXISTS movies(id INTEGER PRIMARY KEY,title TEXT NOT NULL,
+                                          date INTEGER NOT NULL,quality TEXT NOT NULL);
+        CREATE INDEX IF NOT EXISTS movies_title ON movies(title);
+        CREATE INDEX IF NOT EXISTS movies_date ON movies(date);
+        CREATE INDEX IF NOT EXISTS movies_quality ON movies(quality);
+        CREATE TABLE IF NOT EXISTS casts(id INTEGER PRIMARY KEY,name TEXT NOT NULL);
+        CREATE TABLE IF NOT EXISTS links(cast_id INTEGER,movie_id INTEGER,
+                                         PRIMARY KEY(cast_id,movie_id)) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS links_movie ON links(movie_id,cast_id);
+        CREATE TABLE IF NOT EXISTS counters(name TEXT PRIMARY KEY,value INTEGER NOT NULL);
+    """
+    operators={operator.eq:"=",operator.ne:"!=",operator.lt:"<",
+               operator.gt:">",operator.le:"<=",operator.ge:">="}
+
+    def __init__(self,path,batch_size=1000,cache_size=100_000):
+        # readers of the catalog share the connection, so every use of it and
+        # of the caches goes through this lock
+        self.lock=threading.RLock()
+        self.db=sqlite3.connect(path,check_same_thread=False)
+        self.db.executescript(self.schema)
+        self.batch_size=batch_size
+        self.cache_size=cache_size
+        self.pending=0
+
+    def counter(self,name):
+        with self.lock:
+            row=self.db.execute("SELECT value FROM counters WHERE name=?",(name,)).fetchone()
+        return row[0] if row else 0
+
+    def write(self,sql,args):
+        with self.lock:
+            self.db.execute(sql,args)
+            self.pending+=1
+            if self.pending>=self.batch_size:
+                self.commit()
+
+    def commit(self):
+        with self.lock:
+            self.db.commit()
+            self.pending=0
+
+    def close(self):
+        with self.lock:
+            self.commit()
+            self.db.close()
+
+    def cache(self,objects,key,value):
+        # objects is an OrderedDict from the least to the most recently used
+        with self.lock:
+            objects[key]=value
+            objects.move_to_end(key)
+            while len(objects)>self.cache_size:
+                objects.popitem(last=False)
+        return value
+
+    def cached(self,objects,key):
+        # a cache hit counts as a use, None on a miss
+        with self.lock:
+            value=objects.get(key)
+            if value is not None:
+                objects.move_to_end(key)
+        return value
+
+    def add_movie(self,movie,last_id):
+        self.write("INSERT INTO movies VALUES(?,?,?,?)",
+                   (movie.id,movie.title,movie.date,movie.quality))
+        self.write("INSERT OR REPLACE INTO counters VALUES('movie',?)",(last_id,))
+
+    def add_cast(self,cast,last_id):
+        self.write("INSERT INTO casts VALUES(?,?)",(cast.id,cast.name))
+        self.write("INSERT OR REPLACE INTO counters VALUES('cast',?)",(last_id,))
+
+    def add_link(self,cast_id,movie_id):
+        self.write("INSERT INTO links VALUES(?,?)",(cast_id,movie_id))
+
+    def remove_movie(self,id):
+        self.write("DELETE FROM movies WHERE id=?",(id,))
+        self.write("DELETE FROM links WHERE movie_id=?",(id,))
+
+    def remove_cast(self,id):
+        self.write("DELETE FROM casts WHERE id=?",(id,))
+        self.write("DELETE FROM links WHERE cast_id=?",(id,))
+
+    def load_movie(self,id):
+        with self.lock:
+            row=self.db.execute("SELECT title,date,quality FROM movies WHERE id=?",(id,)).fetchone()
+            if row is None:
+                raise InvalidMovieId
+            movie=Movie(id,*row)
+            movie.casts=[x for x, in self.db.execute(
+                "SELECT cast_id FROM links WHERE movie_id=? ORDER BY cast_id",(id,))]
+        return movie
+
+    def load_cast(self,id):
+        with self.lock:
+            row=self.db.execute("SELECT name FROM casts WHERE id=?",(id,)).fetchone()
+            if row is None:
+                raise InvalidCastId
+            cast=Cast(id,*row)
+            cast.movies=[x for x, in self.db.execute(
+                "SELECT movie_id FROM links WHERE cast_id=? ORDER BY movie_id",(id,))]
+        return cast
+
+    def query(self,title=None,date=None,quality=None,after=None,offset=0,limit=None,explain=False):
+        # the ids, and the query plan when explain is set
+        conditions,args=[],[]
+        if title:
+            # every title starting with the prefix sorts in [prefix, next prefix)
+            conditions.append("title>=? AND title<?")
+            args+=[title,title[:-1]+chr(ord(title[-1])+1)]
+        if date is not None:
+            compare,n=date
+            conditions.append(f"date{self.operators[compare]}?")
+            args.append(n)
+        if quality is not None:
+            conditions.append("quality=?")
+            args.append(quality)
+        if after is not None:
+            conditions.append("id>?")
+            args.append(after)
+        where=f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        sql=f"SELECT id FROM movies{where} ORDER BY id"
+        if limit is not None or offset:
+            sql+=" LIMIT ? OFFSET ?"
+            args+=[-1 if limit is None else limit,offset]
+        with self.lock:
+            ids=[x for x, in self.db.execute(sql,args)]
+            plan=[row[-1] for row in self.db.execute("EXPLAIN QUERY PLAN "+sql,args)] if explain else []
+        return ids,plan
+
+
+class Movie:
+    def __init__(self,id,title,date,quality):
+        self.id=id
         self.title=title
         self.date=date
         self.quality=quality
+        # ids of the linked casts, kept sorted
         self.casts = []
-        self.id = Movie.last_id
-        Movie.last_id+=1
-        Movie.objects[self.id]=self
+        # the output of __str__, until the movie changes
+        self.rendered=None
         
     @staticmethod
     def validate(title,date,quality):
@@ -52,64 +239,24 @@ class Movie:
         if quality not in ["720p","1080p","4K"]:
             raise InvalidMovieQuality
     
-    @classmethod
-    def remove(cls,id):
-        if not id in Movie.objects:
-            raise InvalidMovieId
-        
-        movie= cls.objects.pop(id)
-        for cast_id in movie.casts:
-            Cast.objects[cast_id].movies.remove(id)
-        return movie
-
-    @classmethod
-    def get(cls,id):
-        if id not in cls.objects:
-            raise InvalidMovieId
-        return cls.objects[id]
-    
     def __str__(self) -> str:
-        return f'{{title:"{self.title}", \
+        if self.rendered is None:
+            self.rendered=f'{{title:"{self.title}", \
                    date:"{self.date}", \
                    quality:"{self.quality}", \
-                   casts:{list(sorted(self.casts))}}}'
-
-    @classmethod
-    def filter(cls,pattern,by):
-        if by=="title":
-            return list(sorted([
-                x.id for x in cls.objects.values()
-                  if x.title.startswith(pattern)]))
-        
-        elif by=="quality":
-            return list(sorted([
-                x.id for x in cls.objects.values()
-                  if x.quality == pattern]))
-            
-        elif by=="date":
-            ineq,n=pattern
-            if ineq=="=":
-                ineq="=="
-
-            return list(sorted([
-                x.id for x in cls.objects.values()
-                  if eval(f"{x.date}{ineq}{n}") ]))
-        else:
-            raise Exception("invalid by parameter")
+                   casts:{self.casts}}}'
+        return self.rendered
 
 
 
 class Cast:
-    last_id=0
-    objects = {}
-
-    def __init__(self,name) -> None:
-        Cast.validate(name)
+    def __init__(self,id,name) -> None:
+        self.id=id
         self.name=name
+        # ids of the linked movies, kept sorted
         self.movies=[]
-        self.id = Cast.last_id
-        Cast.last_id+=1
-        Cast.objects[self.id]=self
+        # the output of __str__, until the cast changes
+        self.rendered=None
 
 
     @staticmethod
@@ -119,68 +266,623 @@ class Cast:
         if not name.isalpha():
             raise InvalidCastName
     
-    @classmethod
-    def remove(cls,id):
-        if not id in cls.objects:
-            raise InvalidCastId
-        cast= cls.objects.pop(id)
-        for movie_id in cast.movies:
-            Movie.objects[movie_id].casts.remove(id)
-        return cast
-    
-    @classmethod
-    def get(cls,id):
-        if id not in cls.objects:
-            raise InvalidCastId
-        return cls.objects[id]
-    
     def __str__(self) -> str:
-        return f'{{name:"{self.name}", \
-                   movies:{list(sorted(self.movies))}}}'
+        if self.rendered is None:
+            self.rendered=f'{{name:"{self.name}", \
+                   movies:{self.movies}}}'
+        return self.rendered
+
+
+class Catalog:
+    # the movies, casts, id counters and indexes of one site; queries hold
+    # the read side of the lock and may run from many threads at once, while
+    # mutations hold the write side and run one at a time
+    comparisons={"=":operator.eq,"==":operator.eq,"!=":operator.ne,
+                 "<":operator.lt,">":operator.gt,"<=":operator.le,">=":operator.ge}
+
+    def __init__(self,store=None,graph_cache_size=10_000):
+        # with a store, least recently used caches of it
+        self.movies={} if store is None else OrderedDict()
+        self.casts={} if store is None else OrderedDict()
+        # when set, movies and casts are only caches of the SQLite catalog
+        self.store=store
+        self.last_movie_id=store.counter("movie") if store else 0
+        self.last_cast_id=store.counter("cast") if store else 0
+        # year -> ids of the movies of that year, in ascending order
+        self.dates={}
+        # (title, id) of every movie, sorted; new movies go to the short
+        # sorted run new_titles, which is folded in once it grows too long
+        self.titles=[]
+        self.new_titles=[]
+        # prefix -> ids of the movies whose title starts with it, in ascending
+        # order, for the prefixes of up to TITLE_PREFIX_LENGTH characters
+        self.prefix_ids={}
+        # quality -> ids of the movies of that quality, in ascending order
+        self.qualities={}
+        # least recently used results of co_stars and path, at most
+        # graph_cache_size of them, cleared whenever a link or a node changes
+        self.graph_cache=OrderedDict()
+        self.graph_cache_size=graph_cache_size
+        # readers share the lock of the catalog, so the cache has its own
+        self.graph_lock=threading.Lock()
+        self.lock=ReadWriteLock()
+
+    # lookups without locking, for callers that already hold the lock
+
+    def _movie(self,id):
+        if self.store is None:
+            movie=self.movies.get(id)
+            if movie is None:
+                raise InvalidMovieId
+            return movie
+        movie=self.store.cached(self.movies,id)
+        if movie is None:
+            movie=self.store.cache(self.movies,id,self.store.load_movie(id))
+        return movie
+
+    def _cast(self,id):
+        if self.store is None:
+            cast=self.casts.get(id)
+            if cast is None:
+                raise InvalidCastId
+            return cast
+        cast=self.store.cached(self.casts,id)
+        if cast is None:
+            cast=self.store.cache(self.casts,id,self.store.load_cast(id))
+        return cast
+
+    # mutations
+
+    def add_movie(self,title,date,quality):
+        date=int(date)
+        Movie.validate(title,date,quality)
+        with self.lock.write():
+            movie=Movie(self.last_movie_id,title,date,quality)
+            self.last_movie_id+=1
+            if self.store is not None:
+                self.store.add_movie(movie,self.last_movie_id)
+                self.store.cache(self.movies,movie.id,movie)
+                return movie
+            self.movies[movie.id]=movie
+            self.dates.setdefault(date,[]).append(movie.id)
+            bisect.insort(self.new_titles,(title,movie.id))
+            if len(self.new_titles)>max(TITLE_PENDING,len(self.titles)>>TITLE_PENDING_SHIFT):
+                self._fold_titles()
+            for n in range(1,min(len(title),TITLE_PREFIX_LENGTH)+1):
+                self.prefix_ids.setdefault(title[:n],[]).append(movie.id)
+            self.qualities.setdefault(quality,[]).append(movie.id)
+            return movie
+
+    def remove_movie(self,id):
+        with self.lock.write():
+            movie=self._movie(id)
+            self.movies.pop(id,None)
+            for cast_id in movie.casts:
+                if cast_id in self.casts:
+                    _unlink(self.casts[cast_id],self.casts[cast_id].movies,id)
+            self.graph_cache.clear()
+            if self.store is not None:
+                self.store.remove_movie(id)
+                return movie
+
+            ids=self.dates[movie.date]
+            del ids[bisect.bisect_left(ids,id)]
+            if not ids:
+                del self.dates[movie.date]
+            entry=(movie.title,id)
+            titles=self.new_titles if _contains(self.new_titles,entry) else self.titles
+            del titles[bisect.bisect_left(titles,entry)]
+            for n in range(1,min(len(movie.title),TITLE_PREFIX_LENGTH)+1):
+                ids=self.prefix_ids[movie.title[:n]]
+                del ids[bisect.bisect_left(ids,id)]
+                if not ids:
+                    del self.prefix_ids[movie.title[:n]]
+            ids=self.qualities[movie.quality]
+            del ids[bisect.bisect_left(ids,id)]
+            return movie
+
+    def add_cast(self,name):
+        Cast.validate(name)
+        with self.lock.write():
+            cast=Cast(self.last_cast_id,name)
+            self.last_cast_id+=1
+            if self.store is not None:
+                self.store.add_cast(cast,self.last_cast_id)
+                self.store.cache(self.casts,cast.id,cast)
+                return cast
+            self.casts[cast.id]=cast
+            return cast
+
+    def remove_cast(self,id):
+        with self.lock.write():
+            cast=self._cast(id)
+            self.casts.pop(id,None)
+            for movie_id in cast.movies:
+                if movie_id in self.movies:
+                    _unlink(self.movies[movie_id],self.movies[movie_id].casts,id)
+            self.graph_cache.clear()
+            if self.store is not None:
+                self.store.remove_cast(id)
+            return cast
+
+    def link(self,cast_id,movie_id):
+        with self.lock.write():
+            self._link(cast_id,movie_id)
+            self.graph_cache.clear()
+
+    def link_many(self,pairs):
+        # one write lock and one cache clear for the whole batch; a pair that
+        # fails gets its error message and the others are still linked
+        results=[]
+        with self.lock.write():
+            for cast_id,movie_id in pairs:
+                try:
+                    self._link(cast_id,movie_id)
+                    results.append(f"successfully linked {cast_id} to {movie_id}")
+                except BaseException as e:
+                    results.append(str(e))
+            self.graph_cache.clear()
+        return results
 
+    def _link(self,cast_id,movie_id):
+        # for callers that hold the write lock and clear the graph cache
+        cast_id,movie_id = int(cast_id),int(movie_id)
+        cast = self._cast(cast_id)
+        movie = self._movie(movie_id)
+        if _contains(movie.casts,cast_id) or _contains(cast.movies,movie_id):
+            raise AlreadyLink
+        bisect.insort(cast.movies,movie.id)
+        bisect.insort(movie.casts,cast.id)
+        cast.rendered=movie.rendered=None
+        if self.store is not None:
+            self.store.add_link(cast.id,movie.id)
 
-def link(cast_id,movie_id):
+    # queries
 
-    cast_id,movie_id = int(cast_id),int(movie_id)
-    cast = Cast.get(cast_id)
-    movie = Movie.get(movie_id)
-    if cast_id in movie.casts or movie_id in cast.movies:
-        raise AlreadyLink
-    cast.movies.append(movie.id)
-    movie.casts.append(cast.id)
+    def show_movie(self,id):
+        with self.lock.read():
+            return str(self._movie(id))
 
+    def show_cast(self,id):
+        with self.lock.read():
+            return str(self._cast(id))
 
-n = int(input())
-for i in range(n):
+    def filter(self,pattern,by,after=None,offset=0,limit=None):
+        # one page of the ids matching a pattern, in ascending order: the ids
+        # after the cursor id after, less the first offset, at most limit
+        with self.lock.read():
+            if by not in ("title","date","quality"):
+                raise Exception("invalid by parameter")
+            if self.store is not None:
+                return self._query(**{by:pattern},after=after,offset=offset,limit=limit)[0]
+            if by=="title":
+                if not pattern:
+                    buckets=[sorted(self.movies)]
+                else:
+                    stop=None if limit is None else offset+limit
+                    return _page([self.title_ids(pattern,after,stop)],None,offset,limit)
+
+            elif by=="quality":
+                buckets=[self.qualities.get(pattern,[])]
+                
+            else:
+                compare,n=self.comparison(pattern)
+                if compare is operator.eq:
+                    buckets=[self.dates.get(n,[])]
+                else:
+                    buckets=self.date_buckets(compare,n)
+            return _page(buckets,after,offset,limit)
+
+    def _fold_titles(self):
+        # merges the pending run into the title array: one bisect per pending
+        # title and a copy of the slices in between, not a sort of the array
+        titles=[None]*(len(self.titles)+len(self.new_titles))
+        start=done=0
+        for entry in self.new_titles:
+            end=bisect.bisect_left(self.titles,entry,start)
+            titles[done:done+end-start]=self.titles[start:end]
+            done+=end-start
+            titles[done]=entry
+            done+=1
+            start=end
+        titles[done:]=self.titles[start:]
+        self.titles=titles
+        self.new_titles=[]
+
+    def _title_ranges(self,prefix):
+        # every title starting with the prefix sorts in [prefix, next prefix),
+        # in the main array and in the pending run
+        end=(prefix[:-1]+chr(ord(prefix[-1])+1),)
+        ranges=[]
+        for titles in (self.titles,self.new_titles):
+            lo=bisect.bisect_left(titles,(prefix,))
+            ranges.append((titles,lo,bisect.bisect_left(titles,end,lo)))
+        return ranges
+
+    def title_count(self,prefix):
+        if len(prefix)<=TITLE_PREFIX_LENGTH:
+            return len(self.prefix_ids.get(prefix,()))
+        return sum(hi-lo for _,lo,hi in self._title_ranges(prefix))
+
+    def title_ids(self,prefix,after=None,count=None):
+        # the ids of the titles starting with prefix in ascending order, only
+        # those after the id after and at most count of them; short prefixes
+        # are slices of their id lists, longer ones select the count smallest
+        if len(prefix)<=TITLE_PREFIX_LENGTH:
+            ids=self.prefix_ids.get(prefix,[])
+            if after is None and count is None:
+                return ids
+            start=0 if after is None else bisect.bisect_right(ids,after)
+            return ids[start:None if count is None else start+count]
+        ids=(x[1] for titles,lo,hi in self._title_ranges(prefix)
+             for x in itertools.islice(titles,lo,hi))
+        if after is not None:
+            ids=(x for x in ids if x>after)
+        return sorted(ids) if count is None else heapq.nsmallest(count,ids)
+
+    def comparison(self,pattern):
+        ineq,n=pattern
+        if ineq not in self.comparisons or not n.lstrip("-").isdigit():
+            raise InvalidMovieDate
+        return self.comparisons[ineq],int(n)
+
+    def date_buckets(self,compare,n):
+        return [ids for date,ids in self.dates.items() if compare(date,n)]
+
+    def query(self,title=None,date=None,quality=None,after=None,offset=0,limit=None,explain=False):
+        with self.lock.read():
+            return self._query(title,date,quality,after,offset,limit,explain)
+
+    def _query(self,title=None,date=None,quality=None,after=None,offset=0,limit=None,explain=False):
+        # the predicate with the fewest indexed ids drives the query; each next
+        # one is intersected when its index is not larger than the result so
+        # far, and checked on the remaining movies otherwise
+        if self.store is not None:
+            return self.store.query(title,date and self.comparison(date),quality,
+                                    after,offset,limit,explain)
+
+        # (estimated ids, label, sorted ids, test on a movie)
+        predicates=[]
+        if title is not None:
+            predicates.append((self.title_count(title),f"title {title}",
+                               lambda:self.title_ids(title),lambda x:x.title.startswith(title)))
+        if quality is not None:
+            quality_ids=self.qualities.get(quality,[])
+            predicates.append((len(quality_ids),f"quality {quality}",
+                               lambda:quality_ids,lambda x:x.quality==quality))
+        if date is not None:
+            compare,n=self.comparison(date)
+            buckets=self.date_buckets(compare,n)
+            predicates.append((sum(map(len,buckets)),f"date {date[0]} {n}",
+                               lambda:list(heapq.merge(*buckets)),lambda x:compare(x.date,n)))
+        stop=None if limit is None else offset+limit
+        if not predicates:
+            return _page([sorted(self.movies)],after,offset,limit),[f"scan all ({len(self.movies)})"]
+
+        predicates.sort(key=lambda x:x[0])
+        size,label,fetch,_=predicates[0]
+        ids=fetch()
+        # the cursor only skips into the driving ids, the others are filtered
+        ids=ids[bisect.bisect_right(ids,after):] if after is not None else list(ids)
+        plan=[f"index {label} ({size})"]
+        for size,label,fetch,test in predicates[1:]:
+            if size<=len(ids):
+                other=set(fetch())
+                ids=[x for x in ids if x in other]
+                plan.append(f"intersect {label} ({size})")
+            else:
+                ids=[x for x in ids if test(self.movies[x])]
+                plan.append(f"check {label}")
+        return ids[offset:stop],plan
+
+    def _graph_cached(self,key):
+        # (True, result) on a hit, which counts as a use, (False, None) on a miss
+        with self.graph_lock:
+            if key not in self.graph_cache:
+                return False,None
+            self.graph_cache.move_to_end(key)
+            return True,self.graph_cache[key]
+
+    def _graph_cache(self,key,value):
+        with self.graph_lock:
+            self.graph_cache[key]=value
+            self.graph_cache.move_to_end(key)
+            while len(self.graph_cache)>self.graph_cache_size:
+                self.graph_cache.popitem(last=False)
+        return value
+
+    def co_stars(self,cast_id):
+        key=("CO-STARS",cast_id)
+        with self.lock.read():
+            hit,result=self._graph_cached(key)
+            if hit:
+                return result
+            cast=self._cast(cast_id)
+            shared=Counter()
+            for movie_id in cast.movies:
+                shared.update(self._movie(movie_id).casts)
+            del shared[cast_id]
+            return self._graph_cache(key,[x for x,_ in sorted(shared.items(),key=lambda x:(-x[1],x[0]))])
+
+    def path(self,source,target):
+        # shortest cast-movie-cast path found by a bidirectional BFS
+        key=("PATH",source,target)
+        with self.lock.read():
+            hit,result=self._graph_cached(key)
+            if hit:
+                return result
+            self._cast(source)
+            self._cast(target)
+            return self._graph_cache(key,self._bidirectional_path(source,target))
+
+    def _expand(self,frontier,parents,other):
+        # one cast-movie-cast layer of a BFS; returns the nodes met by the other side
+        next_frontier=[]
+        met=[]
+        for cast_id in frontier:
+            for movie_id in self._cast(cast_id).movies:
+                for neighbour in self._movie(movie_id).casts:
+                    if neighbour not in parents:
+                        parents[neighbour]=(cast_id,movie_id)
+                        next_frontier.append(neighbour)
+                        if neighbour in other:
+                            met.append(neighbour)
+        return next_frontier,met
+
+    def _bidirectional_path(self,source,target):
+        if source==target:
+            return [source]
+        # per side: BFS parents, current frontier and depth of every visited cast
+        sides=[({source:None},[source],{source:0}),({target:None},[target],{target:0})]
+        while sides[0][1] and sides[1][1]:
+            # always grow the smaller frontier by one layer
+            grow=0 if len(sides[0][1])<=len(sides[1][1]) else 1
+            parents,frontier,depth=sides[grow]
+            other_parents,_,other_depth=sides[1-grow]
+            layer=depth[frontier[0]]+1
+            frontier,met=self._expand(frontier,parents,other_parents)
+            for cast_id in frontier:
+                depth[cast_id]=layer
+            sides[grow]=(parents,frontier,depth)
+            if met:
+                best=min(met,key=other_depth.get)
+                return _walk(sides[0][0],best)[::-1]+_walk(sides[1][0],best)[1:]
+        return None
+
+
+def _contains(ids,id):
+    i=bisect.bisect_left(ids,id)
+    return i<len(ids) and ids[i]==id
+
+
+def _unlink(node,ids,id):
+    # drop id from the sorted neighbours of a movie or cast
+    i=bisect.bisect_left(ids,id)
+    if i<len(ids) and ids[i]==id:
+        del ids[i]
+        node.rendered=None
+
+
+def _page(buckets,after,offset,limit):
+    # a page of the merged ids of sorted buckets, at a cost that grows with
+    # the page and not with the buckets
+    starts=[0 if after is None else bisect.bisect_right(ids,after) for ids in buckets]
+    stop=None if limit is None else offset+limit
+    if len(buckets)==1:
+        ids,start=buckets[0],starts[0]
+        return ids[start+offset:None if stop is None else start+stop]
+    runs=[map(ids.__getitem__,range(start,len(ids))) for ids,start in zip(buckets,starts)]
+    return list(itertools.islice(heapq.merge(*runs),offset,stop))
+
+
+def _walk(parents,cast_id):
+    # the cast and movie ids from cast_id back to the root of a BFS
+    path=[cast_id]
+    while parents[cast_id] is not None:
+        cast_id,movie_id=parents[cast_id]
+        path+=[movie_id,cast_id]
+    return path
+
+
+def page_options(data):
+    # the pagination of a filter: LIMIT n, OFFSET n and AFTER id, in any order
+    options={}
+    data=list(data)
+    while data:
+        word=data.pop(0)
+        if word in ("LIMIT","OFFSET","AFTER") and data and data[0].isdigit():
+            options[word.lower()]=int(data.pop(0))
+        else:
+            raise InvalidFilter
+    if options.get("limit")==0:
+        raise InvalidFilter
+    return options
+
+
+def filter_ids(catalog,pattern,by,limit=None,**options):
+    # one more id than the page is fetched to tell whether a next page exists
+    return format_ids(catalog.filter(pattern,by,limit=limit and limit+1,**options),limit)
+
+
+def format_ids(ids,limit=None):
+    # str(ids) written a chunk at a time instead of as one giant string; with a
+    # limit, followed by the cursor of the next page or "end"
+    more=limit is not None and len(ids)>limit
+    if more:
+        ids=ids[:limit]
+    yield "["
+    for start in range(0,len(ids),OUTPUT_CHUNK):
+        yield (", " if start else "")+", ".join(map(str,ids[start:start+OUTPUT_CHUNK]))
+    yield "]"
+    if limit is not None:
+        yield f"\nnext AFTER {ids[-1]}" if more else "\nend"
+
+
+def filter_movies(catalog,data):
+    options={}
+    explain=False
+    data=list(data)
+    while data:
+        word=data.pop(0)
+        if word=="EXPLAIN":
+            explain=True
+        elif word in ("TITLE","QUALITY") and data:
+            options[word.lower()]=data.pop(0)
+        elif word=="DATE" and len(data)>=2:
+            options["date"]=(data.pop(0),data.pop(0))
+        elif word in ("LIMIT","OFFSET","AFTER") and data:
+            options.update(page_options([word,data.pop(0)]))
+        else:
+            raise InvalidFilter
+    limit=options.pop("limit",None)
+    ids,plan=catalog.query(**options,limit=limit and limit+1,explain=explain)
+    if explain:
+        return itertools.chain([f"plan: {' -> '.join(plan)}\n"],format_ids(ids,limit))
+    return format_ids(ids,limit)
+
+
+def format_path(ids):
+    if ids is None:
+        return "no path"
+    return " -> ".join(f"{'movie' if i%2 else 'cast'} {x}" for i,x in enumerate(ids))
+
+
+def open_store(path,batch_size=1000,cache_size=100_000,graph_cache_size=10_000):
+    return Catalog(SqliteStore(path,batch_size,cache_size),graph_cache_size)
+
+
+# commands that only read the catalog and may run from a thread pool
+READ_COMMANDS=frozenset(("SHOW-MOVIE","SHOW-CAST","FILTER-MOVIES-BY-TITLE","FILTER-MOVIES-BY-DATE",
+                         "FILTER-MOVIES-BY-QUALITY","FILTER-MOVIES","CO-STARS","PATH"))
+# reads queued by run() before their results are printed
+PENDING_READS=1024
+# titles waiting outside the sorted title array before they are folded in:
+# TITLE_PENDING, or 1/2**TITLE_PENDING_SHIFT of the array when that is more
+TITLE_PENDING=4096
+TITLE_PENDING_SHIFT=6
+# the title prefixes up to this length keep a list of their ids
+TITLE_PREFIX_LENGTH=2
+# ids formatted per write of a filter result
+OUTPUT_CHUNK=4096
+
+
+def execute(catalog,line):
+    # the output of one command line, or None for an unknown command
     try:
-        command,*data = input().split()
+        command,*data = line.split()
         if command=="ADD-MOVIE":
-            movie=Movie(*data)
-            print(f"added successfully {movie.id}")
+            movie=catalog.add_movie(*data)
+            return f"added successfully {movie.id}"
         elif command=="REM-MOVIE":
-            movie=Movie.remove(int(data[0]))
-            print(f"removed successfully {movie.id}")
+            movie=catalog.remove_movie(int(data[0]))
+            return f"removed successfully {movie.id}"
         elif command == "ADD-CAST":
-            cast = Cast(data[0])
-            print(f"added successfully {cast.id}")
+            cast = catalog.add_cast(data[0])
+            return f"added successfully {cast.id}"
         elif command=="REM-CAST":
-            cast = Cast.remove(int(data[0]))
-            print(f"removed successfully {cast.id}")
+            cast = catalog.remove_cast(int(data[0]))
+            return f"removed successfully {cast.id}"
         elif command=="SHOW-MOVIE":
-            movie = Movie.get(int(data[0]))
-            print(movie)
+            return catalog.show_movie(int(data[0]))
         elif command=="SHOW-CAST":
-            cast = Cast.get(int(data[0]))
-            print(cast)
+            return catalog.show_cast(int(data[0]))
         elif command=="LINK-CAST-TO-MOVIE":
-            link(*data)
-            print(f"successfully linked {data[0]} to {data[1]}")
+            if len(data)>2 and len(data)%2==0:
+                # bulk form: LINK-CAST-TO-MOVIE cast movie cast movie ...
+                return "\n".join(catalog.link_many(zip(data[::2],data[1::2])))
+            catalog.link(*data)
+            return f"successfully linked {data[0]} to {data[1]}"
         elif command == "FILTER-MOVIES-BY-TITLE":
-            print(Movie.filter(data[0],"title"))
+            return filter_ids(catalog,data[0],"title",**page_options(data[1:]))
         elif command=="FILTER-MOVIES-BY-DATE":
-            print(Movie.filter(data,"date"))
+            return filter_ids(catalog,data[:2],"date",**page_options(data[2:]))
         elif command=="FILTER-MOVIES-BY-QUALITY":
-            print(Movie.filter(data[0],"quality"))
+            return filter_ids(catalog,data[0],"quality",**page_options(data[1:]))
+        elif command=="FILTER-MOVIES":
+            return filter_movies(catalog,data)
+        elif command=="CO-STARS":
+            return str(catalog.co_stars(int(data[0])))
+        elif command=="PATH":
+            return format_path(catalog.path(int(data[0]),int(data[1])))
 
     except BaseException as e:
-        print(e)
\ No newline at end of file
+        return str(e)
+
+
+def main():
+    parser=argparse.ArgumentParser(description="movie site")
+    parser.add_argument("--db",metavar="PATH",help="keep the catalog in an SQLite database")
+    parser.add_argument("--batch-size",type=int,default=1000,metavar="N",
+                        help="commit the database every N writes")
+    parser.add_argument("--cache-size",type=int,default=100_000,metavar="N",
+                        help="keep at most N movies and N casts in memory")
+    parser.add_argument("--graph-cache-size",type=int,default=10_000,metavar="N",
+                        help="keep at most N CO-STARS and PATH results")
+    parser.add_argument("--threads",type=int,default=1,metavar="N",
+                        help="run consecutive queries on N threads")
+    args=parser.parse_args()
+    catalog=(open_store(args.db,args.batch_size,args.cache_size,args.graph_cache_size) if args.db
+             else Catalog(graph_cache_size=args.graph_cache_size))
+    try:
+        run(catalog,args.threads)
+    finally:
+        if catalog.store is not None:
+            catalog.store.close()
+
+
+def run(catalog,threads=1):
+    n = int(input())
+    if threads>1:
+        with ThreadPoolExecutor(threads) as pool:
+            run_threaded(catalog,n,pool)
+        return
+    for i in range(n):
+        try:
+            line=input()
+        except BaseException as e:
+            print(e)
+            continue
+        write_output(execute(catalog,line))
+
+
+def write_output(output):
+    # an output is a line or, for filters, the pieces of one
+    if output is None:
+        return
+    if isinstance(output,str):
+        output=(output,)
+    for piece in output:
+        sys.stdout.write(piece)
+    sys.stdout.write("\n")
+
+
+def run_threaded(catalog,n,pool):
+    # queries go to the pool while a mutation first waits for the queries
+    # before it, so the output is the same as in a sequential run
+    pending=[]
+
+    def flush():
+        for future in pending:
+            write_output(future.result())
+        pending.clear()
+
+    for i in range(n):
+        try:
+            line=input()
+        except BaseException as e:
+            flush()
+            print(e)
+            continue
+        command=line.split(maxsplit=1)[0] if line.strip() else ""
+        if command in READ_COMMANDS:
+            pending.append(pool.submit(execute,catalog,line))
+            if len(pending)>=PENDING_READS:
+                flush()
+        else:
+            flush()
+            write_output(execute(catalog,line))
+    flush()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+"""
+randomized regression checks of the catalog against brute-force scans
+"""
+import itertools
+import operator
+import os
+import random
+import tempfile
+from collections import Counter,deque
+from concurrent.futures import ThreadPoolExecutor
+
+import main
+from main import Catalog,execute,format_ids,open_store
+
+QUALITIES=["720p","1080p","4K"]
+COMPARISONS={"=":operator.eq,"!=":operator.ne,"<":operator.lt,
+             ">":operator.gt,"<=":operator.le,">=":operator.ge}
+
+
+class Model:
+    # the catalog as plain dicts and sets, queried by scanning everything
+    def __init__(self):
+        self.movies={}
+        self.casts=set()
+        self.links=set()
+        self.last_movie_id=0
+        self.last_cast_id=0
+
+    def apply(self,line):
+        command,*data=line.split()
+        if command=="ADD-MOVIE":
+            self.movies[self.last_movie_id]=(data[0],int(data[1]),data[2])
+            self.last_movie_id+=1
+        elif command=="ADD-CAST":
+            self.casts.add(self.last_cast_id)
+            self.last_cast_id+=1
+        elif command=="REM-MOVIE" and int(data[0]) in self.movies:
+            del self.movies[int(data[0])]
+            self.links={x for x in self.links if x[1]!=int(data[0])}
+        elif command=="REM-CAST" and int(data[0]) in self.casts:
+            self.casts.discard(int(data[0]))
+            self.links={x for x in self.links if x[0]!=int(data[0])}
+        elif command=="LINK-CAST-TO-MOVIE":
+            for cast_id,movie_id in zip(data[::2],data[1::2]):
+                if int(cast_id) in self.casts and int(movie_id) in self.movies:
+                    self.links.add((int(cast_id),int(movie_id)))
+
+    def ids(self,title=None,date=None,quality=None):
+        return sorted(id for id,(t,d,q) in self.movies.items()
+                      if (title is None or t.startswith(title))
+                      and (date is None or COMPARISONS[date[0]](d,int(date[1])))
+                      and (quality is None or q==quality))
+
+    def co_stars(self,cast_id):
+        shared=Counter(c for m in (m for c,m in self.links if c==cast_id)
+                       for c,x in self.links if x==m and c!=cast_id)
+        return [x for x,_ in sorted(shared.items(),key=lambda x:(-x[1],x[0]))]
+
+    def distance(self,source,target):
+        # casts between source and target, by a plain BFS over the links
+        seen={source:0}
+        queue=deque([source])
+        while queue:
+            cast_id=queue.popleft()
+            if cast_id==target:
+                return seen[cast_id]
+            for movie_id in [m for c,m in self.links if c==cast_id]:
+                for neighbour in [c for c,m in self.links if m==movie_id]:
+                    if neighbour not in seen:
+                        seen[neighbour]=seen[cast_id]+1
+                        queue.append(neighbour)
+        return None
+
+
+def random_mutation(model,rng):
+    c=rng.random()
+    movie_id=rng.randrange(model.last_movie_id+1)
+    cast_id=rng.randrange(model.last_cast_id+1)
+    if c<0.3:
+        title="".join(rng.choices("ab",k=rng.randint(1,4)))
+        return f"ADD-MOVIE {title} {rng.randint(1990,1999)} {rng.choice(QUALITIES)}"
+    if c<0.45:
+        return "ADD-CAST cast"
+    if c<0.5:
+        return f"REM-MOVIE {movie_id}"
+    if c<0.53:
+        return f"REM-CAST {cast_id}"
+    if c<0.9:
+        return f"LINK-CAST-TO-MOVIE {cast_id} {movie_id}"
+    pairs=[(rng.randrange(model.last_cast_id+1),rng.randrange(model.last_movie_id+1)) for _ in range(3)]
+    return "LINK-CAST-TO-MOVIE "+" ".join(f"{x} {y}" for x,y in pairs)
+
+
+def random_page(model,rng):
+    # LIMIT, OFFSET and AFTER in a random order, each left out at times
+    words=[]
+    if rng.random()<0.6:
+        words.append(("LIMIT",rng.randint(1,5)))
+    if rng.random()<0.3:
+        words.append(("OFFSET",rng.randint(0,4)))
+    if rng.random()<0.4:
+        words.append(("AFTER",rng.randrange(model.last_movie_id+1)))
+    rng.shuffle(words)
+    return dict((x.lower(),y) for x,y in words)," ".join(f"{x} {y}" for x,y in words)
+
+
+def expected_page(ids,after=None,offset=0,limit=None):
+    if after is not None:
+        ids=[x for x in ids if x>after]
+    return "".join(format_ids(ids[offset:None if limit is None else offset+limit+1],limit))
+
+
+def random_query(model,rng):
+    # a read command and its expected output, or a check of the output for PATH
+    title="".join(rng.choices("ab",k=rng.randint(1,3)))
+    date=(rng.choice(list(COMPARISONS)),str(rng.randint(1989,2000)))
+    quality=rng.choice(QUALITIES)
+    page,words=random_page(model,rng)
+    c=rng.random()
+    if c<0.15:
+        return f"FILTER-MOVIES-BY-TITLE {title} {words}",expected_page(model.ids(title=title),**page)
+    if c<0.25:
+        return f"FILTER-MOVIES-BY-DATE {' '.join(date)} {words}",expected_page(model.ids(date=date),**page)
+    if c<0.35:
+        return f"FILTER-MOVIES-BY-QUALITY {quality} {words}",expected_page(model.ids(quality=quality),**page)
+    if c<0.6:
+        options={"title":title,"date":date,"quality":quality}
+        options={x:y for x,y in options.items() if rng.random()<0.5}
+        terms=" ".join(f"{x.upper()} {' '.join(y) if x=='date' else y}" for x,y in options.items())
+        return f"FILTER-MOVIES {terms} {words}",expected_page(model.ids(**options),**page)
+    casts=sorted(model.casts)
+    if not casts:
+        return "FILTER-MOVIES",expected_page(model.ids())
+    if c<0.8:
+        cast_id=rng.choice(casts)
+        return f"CO-STARS {cast_id}",str(model.co_stars(cast_id))
+    source,target=rng.choice(casts),rng.choice(casts)
+    return f"PATH {source} {target}",lambda output:check_path(model,source,target,output)
+
+
+def check_path(model,source,target,output):
+    # any shortest path will do, as long as it walks along the links
+    distance=model.distance(source,target)
+    if distance is None:
+        return output=="no path"
+    ids=[int(x.split()[1]) for x in output.split(" -> ")]
+    casts,movies=ids[::2],ids[1::2]
+    return (len(ids)==2*distance+1 and casts[0]==source and casts[-1]==target
+            and all((c,m) in model.links for c,m in zip(casts,movies))
+            and all((c,m) in model.links for c,m in zip(casts[1:],movies)))
+
+
+def output(catalog,line):
+    result=execute(catalog,line)
+    return result if isinstance(result,str) else "".join(result)
+
+
+def matches(result,expected):
+    return expected(result) if callable(expected) else result==expected
+
+
+def test_catalogs(rounds=10,steps=300,seed=0):
+    # the in-memory catalog, an SQLite one with caches of two objects, and
+    # the in-memory catalog with its reads on a thread pool like --threads
+    rng=random.Random(seed)
+    # so that the title index goes through the folds of its pending run
+    main.TITLE_PENDING=4
+    with ThreadPoolExecutor(4) as pool,tempfile.TemporaryDirectory() as directory:
+        for n in range(rounds):
+            model=Model()
+            path=os.path.join(directory,f"movies{n}.db")
+            catalogs=[("memory",Catalog(graph_cache_size=3)),
+                      ("sqlite",open_store(path,batch_size=3,cache_size=2,graph_cache_size=3))]
+            threaded=Catalog(graph_cache_size=3)
+            for _ in range(steps):
+                line=random_mutation(model,rng)
+                model.apply(line)
+                results={name:output(catalog,line) for name,catalog in catalogs}
+                results["threads"]=output(threaded,line)
+                assert len(set(results.values()))==1,(line,results)
+                queries=[random_query(model,rng) for _ in range(4)]
+                for name,catalog in catalogs:
+                    for line,expected in queries:
+                        result=output(catalog,line)
+                        assert matches(result,expected),(name,line,result,expected)
+                lines=[line for line,_ in queries]
+                for (line,expected),result in zip(queries,pool.map(output,itertools.repeat(threaded),lines)):
+                    assert matches(result,expected),("threads",line,result,expected)
+            catalogs[1][1].store.close()
+
+    print("catalogs: all tests passed!")
+
+
+if __name__ == "__main__":
+    test_catalogs()
@@ -1,5 +1,16 @@
+import heapq
+import multiprocessing
+import sys
+import time
 from abc import ABC, abstractmethod
 
+try:
+    import numpy as np
+except ImportError:  # SUGGEST falls back to proper() on every object
+    np = None
+
+SHARD_SIZE = 256
+
 class DuplicateTagNameException(BaseException):
     def __str__(self) -> str:
         return "Error: Tag already exists"
@@ -24,14 +35,92 @@ class AdsDoesNotExist(BaseException):
     def __str__(self) -> str:
         return "Error: Ads not found"
 
+class TagColumns:
+    # the cpc and tag count of every object in NumPy arrays indexed by row,
+    # and the tags as a sparse incidence matrix: one array of rows per tag.
+    # Rows follow the order of the objects dict, removed rows stay as dead ones
+
+    def __init__(self, capacity=1024) -> None:
+        self.size = 0
+        self.rows = {}
+        self.ids = np.zeros(capacity, dtype=np.int64)
+        self.cpc = np.zeros(capacity, dtype=np.int64)
+        self.tag_count = np.zeros(capacity, dtype=np.int64)
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.tag_rows = {}
+
+    @classmethod
+    def from_objects(cls, objects):
+        columns = cls(max(len(objects), 1024))
+        for obj in objects:
+            columns.add(obj)
+        return columns
+
+    def _grow(self):
+        capacity = 2 * len(self.ids)
+        for name in ('ids', 'cpc', 'tag_count', 'alive'):
+            column = getattr(self, name)
+            grown = np.zeros(capacity, dtype=column.dtype)
+            grown[:self.size] = column[:self.size]
+            setattr(self, name, grown)
+
+    def add(self, obj):
+        if self.size == len(self.ids):
+            self._grow()
+        row = self.size
+        self.ids[row] = obj.id
+        self.cpc[row] = obj.cpc
+        self.tag_count[row] = len(obj.tag_set)
+        self.alive[row] = True
+        for tag in obj.tag_set:
+            entry = self.tag_rows.get(tag)
+            rows, length = entry if entry is not None else (np.zeros(8, dtype=np.int64), 0)
+            if length == len(rows):
+                rows = np.concatenate((rows, np.zeros(length, dtype=np.int64)))
+            rows[length] = row
+            self.tag_rows[tag] = (rows, length + 1)
+        self.rows[obj.id] = row
+        self.size += 1
+
+    def remove(self, ids):
+        self.alive[[self.rows.pop(id) for id in ids]] = False
+
+    def scores(self, cpc, tags):
+        # proper() of every row against cpc and a set of tags:
+        # common - diff is 2 * common - the row's tag count
+        size = self.size
+        common = np.zeros(size, dtype=np.int64)
+        for tag in tags:
+            if tag in self.tag_rows:
+                rows, length = self.tag_rows[tag]
+                common[rows[:length]] += 1
+        return 1 / np.maximum(np.abs(self.cpc[:size] - cpc), 1) * (2 * common - self.tag_count[:size])
+
+    def top(self, cpc, tags, k=None):
+        # ids by descending score, ties in row order like a stable sort
+        scores = self.scores(cpc, tags)
+        rows = np.flatnonzero(self.alive[:self.size])
+        if k is not None and 0 < k < len(rows):
+            live = scores[rows]
+            kth = np.partition(live, len(rows) - k)[len(rows) - k]
+            rows = rows[live >= kth]
+        rows = rows[np.lexsort((rows, -scores[rows]))][:k]
+        return self.ids[rows].tolist()
+
+
 class AddsPlaceCommon(ABC):
-    objects = []
+    # every subclass keeps its own registry: id -> object, and the set of names
+    objects = {}
+    names = set()
+    # TagColumns of the objects when NumPy is available
+    columns = None
     last_id = 0
 
     def __init__(self, name, cpc, tags) -> None:
         self.name = name
         self.cpc = cpc
         self.tags = tags
+        self.tag_set = frozenset(tags)
         self.id = None
 
     @classmethod
@@ -51,47 +140,79 @@ class AddsPlaceCommon(ABC):
 
     @classmethod
     def append_to_objects(cls, obj):
-        cls.objects.append(obj)
+        cls.objects[obj.id] = obj
+        cls.names.add(obj.name)
+        if cls.columns is not None:
+            cls.columns.add(obj)
+
+    @classmethod
+    def remove(cls, obj):
+        cls.remove_many([obj])
+
+    @classmethod
+    def remove_many(cls, objs):
+        for obj in objs:
+            del cls.objects[obj.id]
+            cls.names.discard(obj.name)
+        if cls.columns is not None:
+            cls.columns.remove([obj.id for obj in objs])
+            if cls.columns.size > 2 * len(cls.objects) + 1024:
+                cls.columns = TagColumns.from_objects(cls.objects.values())
+
+    @classmethod
+    def get(cls, id):
+        try:
+            return cls.objects[id]
+        except KeyError:
+            raise cls.does_not_exist_exception
 
     @classmethod
     def _is_not_duplicate(cls, name):
-        return name not in [x.name for x in cls.objects]
+        return name not in cls.names
 
     def success_message(self):
         return f"Done: {self.__class__.__name__.title()} {self.id} is {self.name}."
 
     @classmethod
     def list(cls):
-        return f"{cls.__name__.upper()}s: {' '.join([x.name for x in sorted(cls.objects, key=lambda x: x.id)])}"
+        return f"{cls.__name__.upper()}s: {' '.join([x.name for x in sorted(cls.objects.values(), key=lambda x: x.id)])}"
 
     @classmethod
     def exist(cls, names):
-        existed_names = [x.name for x in cls.objects]
-        for name in names:
-            if name not in existed_names:
-                return False
-        return True
+        return all(name in cls.names for name in names)
 
     @abstractmethod
     def get_duplicate_exception(self):
         pass
 
-    def suggest(self):
-        ids = map(lambda z: str(z[0]),
-                  sorted([(x.id, self.proper(x.cpc, self.cpc, x.tags, self.tags))
-                         for x in self.suggest_objects.objects], key=lambda y: y[1],
-                         reverse=True))
-        return f"SUGGEST-{self.suggest_objects.__name__.upper()}: {' '.join(list(ids))}"
+    def suggest(self, k=None):
+        return self.format_suggestion(self.suggest_ids(k))
+
+    @classmethod
+    def format_suggestion(cls, ids):
+        return f"SUGGEST-{cls.suggest_objects.__name__.upper()}: {' '.join(map(str, ids))}"
+
+    def suggest_ids(self, k=None):
+        candidates = self.suggest_objects
+        if candidates.columns is not None:
+            return candidates.columns.top(self.cpc, self.tag_set, k)
+        return [z[0] for z in sorted([(x.id, self.proper(x.cpc, self.cpc, x.tag_set, self.tag_set))
+                                      for x in candidates.objects.values()], key=lambda y: y[1],
+                                     reverse=True)[:k]]
 
     @staticmethod
     def proper(cpci, cpcj, tagsi, tagsj):
-        tagsi = set(tagsi)
-        tagsj = set(tagsj)
+        tagsi = tagsi if isinstance(tagsi, frozenset) else set(tagsi)
+        tagsj = tagsj if isinstance(tagsj, frozenset) else set(tagsj)
         common = len(tagsj.intersection(tagsi))
         diff = len(tagsi - tagsj)
         return 1 / max(1, abs(cpci - cpcj)) * (common - diff)
 
 class Place(AddsPlaceCommon):
+    objects = {}
+    names = set()
+    columns = TagColumns() if np is not None else None
+    # set to Ad below, once it is defined
     suggest_objects = None
     duplicate_exception = DuplicatePlaceNameException
     does_not_exist_exception = PlaceDoesNotExist
@@ -100,6 +221,9 @@ class Place(AddsPlaceCommon):
         return self.duplicate_exception
 
 class Ad(AddsPlaceCommon):
+    objects = {}
+    names = set()
+    columns = TagColumns() if np is not None else None
     suggest_objects = Place
     duplicate_exception = DuplicateAdsNameException
     does_not_exist_exception = AdsDoesNotExist
@@ -107,50 +231,238 @@ class Ad(AddsPlaceCommon):
     def get_duplicate_exception(self):
         return self.duplicate_exception
 
+Place.suggest_objects = Ad
+
 class Tag:
     duplicate_exception = DuplicateTagNameException
-    objects = []
+    objects = {}
+    names = set()
+
+    def __init__(self, name=None) -> None:
+        self.name = name
+        self.id = None
 
     @classmethod
     def add_tag(cls, name):
-        if cls._is_not_duplicate(name):
-            tag = Tag(name)
-            tag.id = AddsPlaceCommon._get_id()
-            cls.objects.append(tag)
+        tag = Tag(name)
+        try:
+            tag.save()
             print(tag.success_message())
-        else:
-            raise cls.duplicate_exception
+        except DuplicateTagNameException as e:
+            print(e)
 
     def save(self):
         if self._is_not_duplicate(self.name):
             self.id = AddsPlaceCommon._get_id()
-            self.__class__.objects.append(self)
+            self.__class__.objects[self.id] = self
+            self.__class__.names.add(self.name)
         else:
             raise self.duplicate_exception
 
     @classmethod
     def _is_not_duplicate(cls, name):
-        return name not in [x.name for x in cls.objects]
+        return name not in cls.names
 
     def success_message(self):
         return f"Done: Tag {self.id} is {self.name}."
 
     @classmethod
     def list(cls):
-        return f"TAGS: {' '.join([x.name for x in sorted(cls.objects, key=lambda x: x.id)])}"
+        return f"TAGS: {' '.join([x.name for x in sorted(cls.objects.values(), key=lambda x: x.id)])}"
 
     @classmethod
-    def exist(cls, names):
-        existed_names = [x.name for x in cls.objects]
-        for name in names:
-            if name not in existed_names:
-                return False
-        return True
+    def list_all_tags(cls):
+        print(cls.list())
 
-
-class Ad(AddsPlaceCommon):
+    @classmethod
+    def exist(cls, names):
+        return all(name in cls.names for name in names)
+
+
+_batch_state = None
+
+def _suggest_shard(ids):
+    cls, k = _batch_state
+    return [(id, cls.objects[id].suggest_ids(k)) for id in ids]
+
+def suggest_all(cls, k=None, processes=None, shard_size=SHARD_SIZE):
+    # yields (id, suggested ids) for every object of cls, in id order. Shards
+    # of ids go to a pool forked after the catalog is published in
+    # _batch_state, so workers read the objects and tag columns through
+    # copy-on-write memory instead of having them pickled
+    global _batch_state
+    ids = sorted(cls.objects)
+    shards = [ids[i:i + shard_size] for i in range(0, len(ids), shard_size)]
+    _batch_state = (cls, k)
+    try:
+        if (processes == 1 or len(shards) < 2
+                or 'fork' not in multiprocessing.get_all_start_methods()):
+            for shard in shards:
+                yield from _suggest_shard(shard)
+            return
+        with multiprocessing.get_context('fork').Pool(processes) as pool:
+            for suggested in pool.imap(_suggest_shard, shards):
+                yield from suggested
+    finally:
+        _batch_state = None
+
+
+def match_weights(ads, places):
+    # weights[i][j] is the proper() score SUGGEST-ADS ranks ads[j] by for places[i]
+    if Ad.columns is not None:
+        rows = np.array([Ad.columns.rows[ad.id] for ad in ads], dtype=np.int64)
+        weights = np.empty((len(places), len(ads)))
+        for i, place in enumerate(places):
+            weights[i] = Ad.columns.scores(place.cpc, place.tag_set)[rows]
+        return weights
+    return [[AddsPlaceCommon.proper(ad.cpc, place.cpc, ad.tag_set, place.tag_set) for ad in ads]
+            for place in places]
+
+def greedy_match(weights):
+    # repeatedly takes the best remaining (row, column) pair; a heap holds
+    # the best free column of every row, and only pairs of positive weight match
+    ranked = []
+    for row in weights:
+        if np is not None:
+            columns = np.flatnonzero(row > 0)
+            ranked.append(columns[np.lexsort((columns, -row[columns]))].tolist())
+        else:
+            ranked.append(sorted((j for j, w in enumerate(row) if w > 0), key=lambda j: (-row[j], j)))
+    heap = [(-weights[i][columns[0]], i, 0) for i, columns in enumerate(ranked) if columns]
+    heapq.heapify(heap)
+    taken = set()
+    pairs = []
+    while heap:
+        _, i, k = heapq.heappop(heap)
+        columns = ranked[i]
+        if columns[k] not in taken:
+            taken.add(columns[k])
+            pairs.append((i, columns[k]))
+            continue
+        while k < len(columns) and columns[k] in taken:
+            k += 1
+        if k < len(columns):
+            heapq.heappush(heap, (-weights[i][columns[k]], i, k))
+    return pairs
+
+def hungarian_match(weights):
+    # maximum weight matching by the Hungarian algorithm over the pairs of
+    # positive weight. Every row also gets a column of its own that costs 0,
+    # for staying unmatched, and all other pairs are forbidden: the costs stay
+    # sparse and augmenting paths short, and any number of rows fits.
+    # Both backends run the same float operations in the same order, so
+    # they break ties between equal totals the same way
+    n = len(weights)
+    m = len(weights[0]) if n else 0
+    inf = float("inf")
+    if np is not None:
+        weights = np.asarray(weights, dtype=float)
+        # column 0 is the virtual column of _hungarian_np, built in place
+        cost = np.full((n, m + n + 1), inf)
+        real = cost[:, 1:m + 1]
+        np.negative(weights, out=real)
+        np.copyto(real, inf, where=weights <= 0)
+        cost[np.arange(n), m + 1 + np.arange(n)] = 0.0
+        p = _hungarian_np(cost, n, m + n)
+    else:
+        cost = [[-w if w > 0 else inf for w in row] + [0.0 if k == i else inf for k in range(n)]
+                for i, row in enumerate(weights)]
+        p = _hungarian_py(cost, n, m + n)
+    return [(p[j] - 1, j - 1) for j in range(1, m + 1) if p[j]]
+
+def _hungarian_py(cost, n, m):
+    # the usual 1-based formulation: u and v are the row and column
+    # potentials, column 0 is virtual and p[j] is the row matched to column j.
+    # The row potentials start at the row minima
+    inf = float("inf")
+    u = [0.0] + [min(row) for row in cost]
+    v = [0.0] * (m + 1)
+    p = [0] * (m + 1)
+    way = [0] * (m + 1)
+    for i in range(1, n + 1):
+        p[0] = i
+        j0 = 0
+        minv = [inf] * (m + 1)
+        used = [False] * (m + 1)
+        while p[j0]:
+            used[j0] = True
+            i0 = p[j0]
+            delta = inf
+            j1 = 0
+            for j in range(1, m + 1):
+                if not used[j]:
+                    reduced = cost[i0 - 1][j - 1] - u[i0] - v[j]
+                    if reduced < minv[j]:
+                        minv[j] = reduced
+                        way[j] = j0
+                    if minv[j] < delta:
+                        delta = minv[j]
+                        j1 = j
+            for j in range(m + 1):
+                if used[j]:
+                    u[p[j]] += delta
+                    v[j] -= delta
+                else:
+                    minv[j] -= delta
+            j0 = j1
+        while j0:
+            j1 = way[j0]
+            p[j0] = p[j1]
+            j0 = j1
+    return p
+
+def _hungarian_np(cost, n, m):
+    # _hungarian_py with the loops over the columns done by NumPy. cost
+    # already holds the virtual column 0, with infinite costs, and minv is
+    # kept infinite on the used columns so that whole vectors can be updated
+    u = np.concatenate(([0.0], cost[:, 1:].min(axis=1)))
+    v = np.zeros(m + 1)
+    p = np.zeros(m + 1, dtype=np.int64)
+    way = np.zeros(m + 1, dtype=np.int64)
+    for i in range(1, n + 1):
+        p[0] = i
+        j0 = 0
+        minv = np.full(m + 1, np.inf)
+        blocked = np.zeros(m + 1)
+        used = np.zeros(m + 1, dtype=bool)
+        while p[j0]:
+            used[j0] = True
+            blocked[j0] = np.inf
+            i0 = p[j0]
+            reduced = cost[i0 - 1] - u[i0] - v + blocked
+            better = reduced < minv
+            minv[better] = reduced[better]
+            way[better] = j0
+            j1 = int(np.argmin(minv))
+            delta = minv[j1]
+            u[p[used]] += delta
+            v[used] -= delta
+            minv -= delta
+            minv[j1] = np.inf
+            j0 = j1
+        while j0:
+            j1 = way[j0]
+            p[j0] = p[j1]
+            j0 = j1
+    return p.tolist()
+
+MATCHERS = {"greedy": greedy_match, "exact": hungarian_match}
+
+def match_all(mode="greedy"):
+    # the (ad, place) pairs that maximize the total proper() score, greedily
+    # or exactly; nothing is removed
+    ads = sorted(Ad.objects.values(), key=lambda x: x.id)
+    places = sorted(Place.objects.values(), key=lambda x: x.id)
+    if not ads or not places:
+        return []
+    weights = match_weights(ads, places)
+    pairs = MATCHERS[mode](weights)
+    return sorted(((ads[j], places[i], float(weights[i][j])) for i, j in pairs),
+                  key=lambda x: x[0].id)
+
+
+class AdManager:
     def __init__(self, tag_manager):
-        super().__init__(name=None, cpc=None, tags=None)
         self.tag_manager = tag_manager
 
     def add_ad(self, name, cpc, tag_names):
@@ -166,9 +478,8 @@ class Ad(AddsPlaceCommon):
     def list_all_ads(self):
         print(Ad.list())
 
-class Place(AddsPlaceCommon):
+class PlaceManager:
     def __init__(self, tag_manager, ad_manager):
-        super().__init__(name=None, cpc=None, tags=None)
         self.tag_manager = tag_manager
         self.ad_manager = ad_manager
 
@@ -199,23 +510,59 @@ class Place(AddsPlaceCommon):
         except AdsDoesNotExist as e:
             print(e)
 
+    def suggest_all(self, kind, path=None, processes=None):
+        cls = {"ADS": Ad, "PLACES": Place}.get(kind)
+        if cls is None:
+            print("Error: Invalid request")
+            return
+        if processes is not None:
+            processes = int(processes)
+        out = open(path, "w") if path is not None else sys.stdout
+        try:
+            for id, ids in suggest_all(cls, processes=processes):
+                out.write(f"{id} {cls.format_suggestion(ids)}\n")
+        finally:
+            if path is not None:
+                out.close()
+
+    def match_all(self, mode="greedy"):
+        if mode not in MATCHERS:
+            print("Error: Invalid request")
+            return
+        started = time.perf_counter()
+        matched = match_all(mode)
+        Ad.remove_many([ad for ad, _, _ in matched])
+        Place.remove_many([place for _, place, _ in matched])
+        elapsed = time.perf_counter() - started
+        for ad, place, _ in matched:
+            print(f"Done: {ad.id} matched to {place.id}")
+        total = sum(score for _, _, score in matched)
+        print(f"MATCH-ALL: {len(matched)} pairs, total score {total:.6g}, {mode} in {elapsed * 1e3:.1f} ms")
+
     def match_ad_place(self, ad_id, place_id):
         try:
             ad = Ad.get(ad_id)
             place = Place.get(place_id)
-            Ad.objects.remove(ad)
-            Place.objects.remove(place)
+            Ad.remove(ad)
+            Place.remove(place)
             print(f"Done: {ad.id} matched to {place.id}")
         except AdsDoesNotExist as e:
             print(e)
         except PlaceDoesNotExist as e:
             print(e)
 
+def parse_options(tokens, keys):
+    # the "key value" pairs of a request, or None when the tokens don't pair
+    # up or a key is not one of keys
+    if len(tokens) % 2 or any(key not in keys for key in tokens[::2]):
+        return None
+    return dict(zip(tokens[::2], tokens[1::2]))
+
 def main():
     # Create the necessary objects
     tag_manager = Tag()
-    ad_manager = Ad(tag_manager)
-    place_manager = Place(tag_manager, ad_manager)
+    ad_manager = AdManager(tag_manager)
+    place_manager = PlaceManager(tag_manager, ad_manager)
 
     # Read the number of requests
     n = int(input())
@@ -239,6 +586,20 @@ def main():
             place_manager.suggest_ads(int(request[2]))
         elif request[0] == "SUGGEST-PLACE":
             place_manager.suggest_places(int(request[2]))
+        elif request[0] == "SUGGEST-ALL":
+            # SUGGEST-ALL ADS|PLACES [file PATH] [processes N]
+            options = parse_options(request[2:], ("file", "processes"))
+            if len(request) < 2 or options is None or not options.get("processes", "1").isdigit():
+                print("Error: Invalid request")
+            else:
+                place_manager.suggest_all(request[1], options.get("file"), options.get("processes"))
+        elif request[0] == "MATCH-ALL":
+            # MATCH-ALL [mode greedy|exact]
+            options = parse_options(request[1:], ("mode",))
+            if options is None:
+                print("Error: Invalid request")
+            else:
+                place_manager.match_all(options.get("mode", "greedy"))
         elif request[0] == "MATCH":
             place_manager.match_ad_place(int(request[2]), int(request[4]))
         else:
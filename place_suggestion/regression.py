@@ -0,0 +1,91 @@
+"""
+randomized regression checks of MATCH-ALL's matchers against brute force
+"""
+import random
+
+import py
+
+def brute_force(weights):
+    # the best total weight over every matching of positive pairs
+    columns = len(weights[0]) if weights else 0
+
+    def best(i, used):
+        if i == len(weights):
+            return 0.0
+        result = best(i + 1, used)
+        for j in range(columns):
+            if j not in used and weights[i][j] > 0:
+                result = max(result, weights[i][j] + best(i + 1, used | {j}))
+        return result
+
+    return best(0, frozenset())
+
+def random_weights(rng):
+    # small matrices with negative, zero, tied and fractional weights
+    n, m = rng.randint(1, 5), rng.randint(1, 5)
+    return [[rng.choice((rng.uniform(-3, 3), rng.randint(-2, 3), 0.0)) for _ in range(m)]
+            for _ in range(n)]
+
+def check_matching(weights, pairs):
+    rows = [i for i, _ in pairs]
+    columns = [j for _, j in pairs]
+    assert len(set(rows)) == len(rows) and len(set(columns)) == len(columns), pairs
+    assert all(weights[i][j] > 0 for i, j in pairs), pairs
+    return sum(weights[i][j] for i, j in pairs)
+
+def test_matchers(cases=500, seed=0):
+    # hungarian_match is exact and greedy_match never beats it; both run
+    # with NumPy when it is installed and on the plain lists, and pick the
+    # same pairs there
+    backends = [("python", None)] + ([("numpy", py.np)] if py.np is not None else [])
+    numpy = py.np
+    rng = random.Random(seed)
+    try:
+        for _ in range(cases):
+            weights = random_weights(rng)
+            expected = brute_force(weights)
+            results = []
+            for name, module in backends:
+                py.np = module
+                matrix = weights if py.np is None else py.np.array(weights)
+                exact_pairs = py.hungarian_match(matrix)
+                exact = check_matching(weights, exact_pairs)
+                assert abs(exact - expected) < 1e-9, (name, weights, exact, expected)
+                greedy_pairs = py.greedy_match(matrix)
+                greedy = check_matching(weights, greedy_pairs)
+                assert greedy <= exact + 1e-9, (name, weights, greedy, exact)
+                results.append((exact_pairs, greedy_pairs))
+            # the same pairs, not only the same total, in every backend
+            assert all(x == results[0] for x in results), (weights, results)
+    finally:
+        py.np = numpy
+
+    print(f"matchers ({', '.join(name for name, _ in backends)}): all tests passed!")
+
+def test_backends_agree(cases=50, seed=1):
+    # larger matrices with many tied weights, too big for brute force: the
+    # plain lists and NumPy must still return the same pairs
+    if py.np is None:
+        print("backends: skipped without NumPy")
+        return
+    numpy = py.np
+    rng = random.Random(seed)
+    values = (-1.0, 0.0, 0.0, 1 / 3, 0.5, 1.0, 1.0, 2.0)
+    try:
+        for _ in range(cases):
+            n, m = rng.randint(5, 40), rng.randint(5, 40)
+            weights = [[rng.choice(values) for _ in range(m)] for _ in range(n)]
+            results = []
+            for module in (None, numpy):
+                py.np = module
+                matrix = weights if module is None else module.array(weights)
+                results.append((py.hungarian_match(matrix), py.greedy_match(matrix)))
+            assert results[0] == results[1], (weights, results)
+    finally:
+        py.np = numpy
+
+    print("backends: all tests passed!")
+
+if __name__ == '__main__':
+    test_matchers()
+    test_backends_agree()